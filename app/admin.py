@@ -2,13 +2,17 @@ from django.contrib import admin
 from django.contrib.admin import display
 from django.utils.html import format_html
 
-from app import models
+from app import deletion, models, tasks
 
 
 @admin.register(models.Album)
 class AlbumAdmin(admin.ModelAdmin):
-    list_display = ['id', 'title', 'photos_amount', 'owner']
+    list_display = ['id', 'title', 'photos_count', 'owner']
     list_display_links = ['id', 'title']
+    
+    def delete_queryset(self, request, queryset):
+        with deletion.deferred_cleanup():
+            super().delete_queryset(request, queryset)
 
 
 @admin.register(models.Photo)
@@ -20,6 +24,18 @@ class PhotoAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).prefetch_related('tags')
+    
+    def delete_queryset(self, request, queryset):
+        with deletion.deferred_cleanup():
+            super().delete_queryset(request, queryset)
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'album' in form.changed_data:
+            models.Album.change_photos_count(
+                {form.initial['album']: -1, obj.album_id: 1})
+            tasks.enqueue(tasks.refresh_albums,
+                          [form.initial['album'], obj.album_id])
 
     @display(description='Теги')
     def tag_list(self, obj):
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        from PIL import Image
+        from app import checks, signals  # noqa: F401
+        from config import settings
+        # Pillow refuses to open anything twice this size
+        Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import re
+import struct
+import zlib
+from typing import NamedTuple
+from urllib.parse import quote
+
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+
+from app.caching import get_cache
+from app.media import CHUNK_SIZE, parse_range
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+# Sizes and CRC follow the data in a descriptor; names are UTF-8
+FLAGS = 0x08 | 0x800
+EXTERNAL_ATTRIBUTES = 0o100644 << 16
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+END_OF_CENTRAL_DIRECTORY = struct.Struct('<IHHHHIIH')
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+
+UNSAFE_NAME_RE = re.compile(r'[\x00-\x1f/\\:*?"<>|]+')
+
+
+class Entry(NamedTuple):
+    name: str
+    path: str
+    size: int
+    modified: tuple
+    content_key: str
+
+
+def get_dos_time(value):
+    value = timezone.localtime(value)
+    if value.year < 1980:
+        return 0, (1 << 5) | 1
+    return (value.hour << 11 | value.minute << 5 | value.second // 2,
+            (value.year - 1980) << 9 | value.month << 5 | value.day)
+
+
+def get_entry_names(titles):
+    """
+    Turn photo titles with the file extensions into safe archive names,
+    numbering repeated names like ``title (2).jpg``.
+    """
+    seen = set()
+    for title, extension in titles:
+        stem = UNSAFE_NAME_RE.sub('_', title).strip(' .') or 'photo'
+        name, number = f'{stem}{extension}', 1
+        while name.lower() in seen:
+            number += 1
+            name = f'{stem} ({number}){extension}'
+        seen.add(name.lower())
+        yield name
+
+
+def get_entries(photos):
+    photos = list(photos)
+    names = get_entry_names(
+        (photo.title, os.path.splitext(photo.photo.name)[1].lower())
+        for photo in photos)
+    return [
+        Entry(name=name,
+              path=photo.photo.name,
+              size=default_storage.size(photo.photo.name),
+              modified=get_dos_time(photo.uploaded_at),
+              content_key=photo.content_hash or photo.photo.name)
+        for name, photo in zip(names, photos)
+    ]
+
+
+class ZipStream:
+    """
+    ZIP archive of stored files without compression, generated while it is
+    sent. File sizes are known in advance, so the archive length and every
+    offset are computed before reading any data; the CRC of each file is
+    calculated on the fly and written in a descriptor after its data.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.zip64 = False
+        self.layout()
+        if self.size > ZIP64_LIMIT or len(entries) >= ZIP_MAX_ENTRIES:
+            self.zip64 = True
+            self.layout()
+
+    @property
+    def version(self):
+        return 45 if self.zip64 else 20
+
+    def layout(self):
+        self.offsets, offset = [], 0
+        for entry in self.entries:
+            self.offsets.append(offset)
+            offset += len(self.get_local_header(entry)) + entry.size + \
+                len(self.get_descriptor(entry, 0))
+        self.directory_offset = offset
+        self.size = offset + len(self.get_directory([0] * len(self.entries)))
+
+    @property
+    def etag(self):
+        digest = hashlib.sha256()
+        for entry in self.entries:
+            digest.update(f'{entry.name}\0{entry.path}\0{entry.size}\0'
+                          .encode())
+        return f'"{digest.hexdigest()[:32]}"'
+
+    def get_local_header(self, entry):
+        name = entry.name.encode()
+        extra, size = b'', 0
+        if self.zip64:
+            extra, size = struct.pack('<HHQQ', 1, 16, 0, 0), ZIP64_LIMIT
+        return LOCAL_HEADER.pack(
+            0x04034b50, self.version, FLAGS, 0, *entry.modified, 0, size,
+            size, len(name), len(extra)) + name + extra
+
+    def get_descriptor(self, entry, crc):
+        size_format = 'QQ' if self.zip64 else 'II'
+        return struct.pack(f'<II{size_format}', 0x08074b50, crc,
+                           entry.size, entry.size)
+
+    def get_directory(self, crcs):
+        records = []
+        for entry, offset, crc in zip(self.entries, self.offsets, crcs):
+            name = entry.name.encode()
+            extra, size = b'', entry.size
+            if self.zip64:
+                extra = struct.pack('<HHQQQ', 1, 24, size, size, offset)
+                size = offset = ZIP64_LIMIT
+            records.append(CENTRAL_HEADER.pack(
+                0x02014b50, self.version, self.version, FLAGS, 0,
+                *entry.modified, crc, size, size, len(name), len(extra), 0,
+                0, 0, EXTERNAL_ATTRIBUTES, offset) + name + extra)
+        directory = b''.join(records)
+        count, directory_size = len(self.entries), len(directory)
+        offset = self.directory_offset
+        end = b''
+        if self.zip64:
+            end = ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+                0x06064b50, 44, self.version, self.version, 0, 0, count,
+                count, directory_size, offset) + ZIP64_LOCATOR.pack(
+                0x07064b50, 0, offset + directory_size, 1)
+            count = ZIP_MAX_ENTRIES
+            directory_size = offset = ZIP64_LIMIT
+        return directory + end + END_OF_CENTRAL_DIRECTORY.pack(
+            0x06054b50, 0, 0, count, count, directory_size, offset, 0)
+
+    @staticmethod
+    def get_crc_cache_key(entry):
+        return 'archive:crc:' + \
+            hashlib.sha256(entry.content_key.encode()).hexdigest()
+
+    def get_crc(self, entry):
+        # Needed for the descriptors and the directory when a range starts
+        # after the file; stored files never change, so the CRC is cached.
+        crc = get_cache().get(self.get_crc_cache_key(entry))
+        if crc is None:
+            crc = yield from self.read_file(entry, entry.size, entry.size)
+        return crc
+
+    def read_file(self, entry, first, last):
+        # Yield the bytes of the file between positions ``first`` and
+        # ``last``, then return its CRC, or ``None`` when the range ends
+        # before the file does. The CRC covers the whole file, so it is
+        # always read from the start.
+        crc, position = 0, 0
+        with default_storage.open(entry.path, 'rb') as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                if position > last:
+                    return None
+                crc = zlib.crc32(chunk, crc)
+                end = position + len(chunk)
+                if end > first and position <= last:
+                    yield chunk[max(first - position, 0):last - position + 1]
+                position = end
+        get_cache().set(self.get_crc_cache_key(entry), crc, None)
+        return crc
+
+    def stream(self, first=0, last=None):
+        """
+        Generate the bytes of the archive between positions ``first`` and
+        ``last`` inclusive.
+        """
+        last = self.size - 1 if last is None else last
+        crcs = []
+        for entry, offset in zip(self.entries, self.offsets):
+            if offset > last:
+                return
+            header = self.get_local_header(entry)
+            yield from slice_range(header, offset, first, last)
+            data_offset = offset + len(header)
+            descriptor_offset = data_offset + entry.size
+            if descriptor_offset <= first:
+                crc = yield from self.get_crc(entry)
+            else:
+                crc = yield from self.read_file(
+                    entry, first - data_offset, last - data_offset)
+            if crc is None:
+                return
+            crcs.append(crc)
+            yield from slice_range(self.get_descriptor(entry, crc),
+                                   descriptor_offset, first, last)
+        yield from slice_range(
+            self.get_directory(crcs), self.directory_offset, first, last)
+
+
+def slice_range(data, offset, first, last):
+    # Part of ``data`` placed at ``offset`` that falls into the range
+    if offset + len(data) > first and offset <= last:
+        yield data[max(first - offset, 0):last - offset + 1]
+
+
+def serve(request, filename, entries):
+    """
+    Stream a ZIP archive of ``entries`` with support for single byte
+    ranges, so interrupted downloads can be resumed.
+    """
+    archive = ZipStream(entries)
+    headers = {
+        'ETag': archive.etag,
+        'Cache-Control': 'private, no-cache',
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition':
+            f"attachment; filename*=UTF-8''{quote(filename, safe='')}",
+    }
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range == archive.etag:
+        try:
+            byte_range = parse_range(
+                request.headers.get('Range'), archive.size)
+        except ValueError:
+            headers['Content-Range'] = f'bytes */{archive.size}'
+            return HttpResponse(
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers=headers)
+    if byte_range is None:
+        response = StreamingHttpResponse(
+            archive.stream(), content_type='application/zip')
+        response['Content-Length'] = archive.size
+    else:
+        first, last = byte_range
+        response = StreamingHttpResponse(
+            archive.stream(first, last),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type='application/zip')
+        response['Content-Length'] = last - first + 1
+        response['Content-Range'] = f'bytes {first}-{last}/{archive.size}'
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import connection
+
+BLOBS_DIR = 'blobs'
+THUMBNAILS_DIR = 'thumbnails'
+
+
+def get_content_path(prefix, content_hash, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{prefix}/{content_hash[:2]}/{content_hash[2:4]}/' \
+           f'{content_hash}{extension}'
+
+
+def save_content(name, content):
+    # Identical files can be stored by several workers at once: the
+    # storage then picks another name for the copy, which is dropped.
+    if default_storage.exists(name):
+        return name
+    if not isinstance(content, File):
+        content = ContentFile(content)
+    saved = default_storage.save(name, content)
+    if saved != name:
+        default_storage.delete(saved)
+    return name
+
+
+def lock_content(content_hash):
+    """
+    Wait until no other transaction releases or restores the files of
+    ``content_hash``. The lock is held until the current transaction ends
+    and is only taken on PostgreSQL.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        # The first 60 bits of the hash fit the signed 64-bit lock key
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                       [int(content_hash[:15], 16)])
+
+
+def get_content_hash(file):
+    """
+    Return the sha256 of ``file``: the digest computed by the upload
+    handlers while the request was streamed, or one computed by reading
+    the file in chunks otherwise.
+    """
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+class ContentHashMixin:
+    # Hashes the chunks a handler stores so the digest is ready when the
+    # upload completes, without reading the file a second time.
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.hasher.hexdigest()
+        return file
@@ -0,0 +1,149 @@
+import os
+from collections import Counter
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from rest_framework import serializers
+from taggit.models import Tag, TaggedItem
+
+from app import search, tasks
+from app.caching import invalidate_user
+from app.models import Album, Photo
+from app.validators import validate_image
+
+
+def get_tags(names):
+    return [Tag.objects.get_or_create(name=name)[0] for name in set(names)]
+
+
+def replace_tags(photo_tags):
+    """
+    Replace the tags of several photos with one delete and one insert.
+    ``photo_tags`` maps photo ids to lists of tag names.
+    """
+    if not photo_tags:
+        return
+    content_type = ContentType.objects.get_for_model(Photo)
+    tags = {
+        tag.name: tag
+        for tag in get_tags(name for names in photo_tags.values()
+                            for name in names)
+    }
+    TaggedItem.objects.filter(
+        content_type=content_type, object_id__in=photo_tags).delete()
+    TaggedItem.objects.bulk_create([
+        TaggedItem(content_type=content_type, object_id=photo_id,
+                   tag=tags[name])
+        for photo_id, names in photo_tags.items() for name in set(names)
+    ])
+
+
+def create_photos(owner, album, files, tags):
+    file_field = serializers.FileField(validators=[validate_image])
+    photos, results = [], []
+    for index, file in enumerate(files):
+        try:
+            file = file_field.run_validation(file)
+        except serializers.ValidationError as e:
+            results.append({
+                'index': index, 'filename': file.name, 'status': 'error',
+                'errors': e.detail
+            })
+            continue
+        title = os.path.splitext(os.path.basename(file.name))[0]
+        photo = Photo(owner=owner, album=album, title=title[:255], photo=file)
+        photo.store_content()
+        photos.append(photo)
+        results.append({
+            'index': index, 'filename': file.name, 'status': 'created'})
+    with transaction.atomic():
+        Photo.objects.bulk_create(photos)
+        for photo in photos:
+            transaction.on_commit(photo.restore_content)
+        Album.change_photos_count({album.pk: len(photos)})
+        if tags:
+            replace_tags({photo.pk: tags for photo in photos})
+    for photo in photos:
+        if photo.thumbnail_status == Photo.ThumbnailStatus.PENDING:
+            tasks.enqueue(tasks.generate_thumbnail, photo.pk)
+    tasks.enqueue(search.update_photo_documents, [p.pk for p in photos])
+    if photos:
+        tasks.enqueue(tasks.refresh_albums, [album.pk])
+    created = iter(photos)
+    for result in results:
+        if result['status'] == 'created':
+            result['id'] = next(created).pk
+    invalidate_user(owner.pk)
+    return results
+
+
+def update_photos(owner, items):
+    photos = Photo.objects.filter(owner=owner)\
+        .in_bulk([item['id'] for item in items])
+    albums = Album.objects.filter(owner=owner).in_bulk(
+        [item['album'] for item in items if 'album' in item])
+    changed, fields, photo_tags, results, moved = {}, set(), {}, [], []
+    moved_albums = Counter()
+    for item in items:
+        photo = photos.get(item['id'])
+        if photo is None:
+            results.append({
+                'id': item['id'], 'status': 'error',
+                'errors': {'detail': 'photo not found'}
+            })
+            continue
+        if 'album' in item and item['album'] not in albums:
+            results.append({
+                'id': item['id'], 'status': 'error',
+                'errors': {'album': 'album not found'}
+            })
+            continue
+        if 'title' in item:
+            photo.title = item['title']
+            fields.add('title')
+        if 'album' in item and photo.album_id != item['album']:
+            moved_albums[photo.album_id] -= 1
+            moved_albums[item['album']] += 1
+            photo.album = albums[item['album']]
+            fields.add('album')
+            moved.append(photo.pk)
+        if 'tags' in item:
+            photo_tags[photo.pk] = item['tags']
+        changed[photo.pk] = photo
+        results.append({'id': item['id'], 'status': 'updated'})
+    with transaction.atomic():
+        if fields:
+            Photo.objects.bulk_update(changed.values(), sorted(fields))
+        Album.change_photos_count(moved_albums)
+        replace_tags(photo_tags)
+    if fields or photo_tags:
+        tasks.enqueue(search.update_photo_documents, list(changed))
+    if moved:
+        tasks.enqueue(tasks.relocate_legacy_files, moved)
+        tasks.enqueue(tasks.refresh_albums, moved_albums)
+    invalidate_user(owner.pk)
+    return results
+
+
+def move_photos(owner, album, photo_ids):
+    photo_ids = set(photo_ids)
+    found = dict(Photo.objects.filter(owner=owner, pk__in=photo_ids)
+                 .values_list('pk', 'album_id'))
+    moved = [pk for pk, album_id in found.items() if album_id != album.pk]
+    if moved:
+        changes = Counter(found[pk] for pk in moved)
+        for album_id in changes:
+            changes[album_id] = -changes[album_id]
+        changes[album.pk] = len(moved)
+        with transaction.atomic():
+            Photo.objects.filter(pk__in=moved).update(album=album)
+            Album.change_photos_count(changes)
+        tasks.enqueue(search.update_photo_documents, moved)
+        tasks.enqueue(tasks.relocate_legacy_files, moved)
+        tasks.enqueue(tasks.refresh_albums, changes)
+        invalidate_user(owner.pk)
+    return {
+        'album': album.pk,
+        'moved': len(moved),
+        'not_found': sorted(photo_ids - set(found)),
+    }
@@ -0,0 +1,122 @@
+import hashlib
+import time
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from app import media
+from config import settings
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'api:version:{user_id}'
+
+
+def _new_version():
+    return uuid.uuid4().hex, int(time.time())
+
+
+def get_version(user_id):
+    cache = get_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = _new_version()
+        if not cache.add(_version_key(user_id), version,
+                         timeout=settings.API_CACHE_VERSION_TTL):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def bump_version(user_id):
+    get_cache().set(_version_key(user_id), _new_version(),
+                    timeout=settings.API_CACHE_VERSION_TTL)
+
+
+def invalidate_user(user_id):
+    # The second bump drops responses cached by concurrent requests
+    # that read the data before the writing transaction committed.
+    bump_version(user_id)
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+# Caches ``list`` and ``retrieve`` responses per user and answers
+# conditional requests with 304 without running the query.
+class ConditionalResponseMixin:
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_object(self):
+        # Looked up before the cache is consulted, then reused by the handler
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def check_request(self, request):
+        # Missing or foreign objects and invalid filters are reported
+        # before any cached answer; filtering a list runs no query.
+        if self.lookup_field in self.kwargs:
+            self.get_object()
+        else:
+            self.filter_queryset(self.get_queryset())
+
+    def get_etag(self, request, version):
+        key = ':'.join([
+            str(request.user.pk), version, request.build_absolute_uri(),
+            request.accepted_media_type or '',
+        ])
+        return '"%s"' % hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def is_not_modified(request, etag, last_modified):
+        # Only called for a representation served before, so ``*`` is not
+        # needed and never matches
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return etag in parse_etags(if_none_match)
+        if_modified_since = parse_http_date_safe(
+            request.headers.get('If-Modified-Since'))
+        return if_modified_since is not None and \
+            last_modified <= if_modified_since
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        self.check_request(request)
+        token, last_modified = get_version(request.user.pk)
+        if settings.MEDIA_SIGNED_URLS:
+            # Responses embed signed media URLs that are re-signed with a
+            # new expiry once the signing bucket rolls over.
+            epoch = media.get_signing_epoch()
+            token = f'{token}:{epoch}'
+            last_modified = max(last_modified, epoch)
+        etag = self.get_etag(request, token)
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(last_modified),
+            'Cache-Control': 'private, no-cache',
+        }
+        cache = get_cache()
+        cache_key = f'api:response:{etag}'
+        data = cache.get(cache_key)
+        if data is not None:
+            # The same representation was served with 200 for this key
+            if self.is_not_modified(request, etag, last_modified):
+                return Response(status=status.HTTP_304_NOT_MODIFIED,
+                                headers=headers)
+            return Response(data, headers=headers)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(cache_key, response.data, settings.API_CACHE_TIMEOUT)
+            for header, value in headers.items():
+                response[header] = value
+        return response
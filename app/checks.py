@@ -0,0 +1,29 @@
+from django.core.checks import Tags, Warning, register
+
+from config import settings
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+# Cache aliases whose entries every worker process has to see: versions
+# bumped on writes, revoked tokens and login attempts must reach the
+# workers that answer the next requests.
+SHARED_CACHE_SETTINGS = [
+    'API_CACHE_ALIAS', 'AUTH_TOKEN_CACHE_ALIAS', 'THROTTLE_CACHE_ALIAS']
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    if settings.DEBUG:
+        return []
+    warnings = []
+    for name in SHARED_CACHE_SETTINGS:
+        alias = getattr(settings, name)
+        if settings.CACHES[alias]['BACKEND'] == LOCMEM_BACKEND:
+            warnings.append(Warning(
+                f'{name} points at the local-memory cache "{alias}".',
+                hint='A local-memory cache is only correct with a single '
+                     'process. Set CACHE_BACKEND to a shared backend '
+                     '(Redis, Memcached, database or files) when running '
+                     'several workers.',
+                id='app.W001'))
+    return warnings
@@ -0,0 +1,54 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app import tasks
+from app.caching import invalidate_user
+from app.models import Album
+
+_deleted_photos = ContextVar('deleted_photos', default=None)
+
+
+class DeletedPhotos:
+    def __init__(self):
+        self.owners = set()
+        self.albums = Counter()
+        self.files = []
+
+
+@contextmanager
+def deferred_cleanup():
+    """
+    Collect the photos deleted inside the block, then update the photo
+    counters and invalidate the caches once, and release all their files
+    and refresh their albums in one background job each instead of for
+    every deleted photo.
+    """
+    deleted = DeletedPhotos()
+    token = _deleted_photos.set(deleted)
+    try:
+        yield deleted
+    finally:
+        _deleted_photos.reset(token)
+    Album.change_photos_count(
+        {album_id: -count for album_id, count in deleted.albums.items()})
+    for owner_id in deleted.owners:
+        invalidate_user(owner_id)
+    if deleted.files:
+        tasks.enqueue(tasks.release_files, deleted.files)
+    if deleted.albums:
+        tasks.enqueue(tasks.refresh_albums, deleted.albums)
+
+
+def photo_deleted(photo):
+    files = (photo.content_hash, photo.photo.name, photo.thumbnail.name)
+    deleted = _deleted_photos.get()
+    if deleted is None:
+        Album.change_photos_count({photo.album_id: -1})
+        invalidate_user(photo.owner_id)
+        tasks.enqueue(tasks.release_files, [files])
+        tasks.enqueue(tasks.refresh_albums, [photo.album_id])
+    else:
+        deleted.owners.add(photo.owner_id)
+        deleted.albums[photo.album_id] += 1
+        deleted.files.append(files)
@@ -5,3 +5,8 @@ from rest_framework.exceptions import APIException
 class UploadSizeError(APIException):
     status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
     default_detail = 'File size exceeds maximum allowed'
+
+
+class UploadOffsetError(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Chunk does not start at the current upload offset'
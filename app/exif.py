@@ -0,0 +1,124 @@
+import datetime
+from typing import NamedTuple, Optional
+
+from PIL import Image
+from django.utils import timezone
+
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+ORIENTATION = 0x0112
+MAKE = 0x010F
+MODEL = 0x0110
+DATE_TIME = 0x0132
+DATE_TIME_ORIGINAL = 0x9003
+DATE_TIME_DIGITIZED = 0x9004
+OFFSET_TIME_ORIGINAL = 0x9011
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+
+EXIF_DATE_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+# Orientations 5-8 are rotated by 90 degrees, so the displayed image has
+# width and height swapped
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class Metadata(NamedTuple):
+    width: Optional[int] = None
+    height: Optional[int] = None
+    taken_at: Optional[datetime.datetime] = None
+    camera_make: str = ''
+    camera_model: str = ''
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+def read_metadata(file):
+    """
+    Read the dimensions and EXIF data of an image. Only the file header is
+    parsed, pixel data is never decoded. Unreadable files give empty
+    metadata.
+    """
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            width, height = image.size
+            exif = image.getexif()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return Metadata()
+    finally:
+        file.seek(0)
+    if isinstance(exif.get(ORIENTATION), int) and \
+            exif.get(ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    details = get_ifd(exif, EXIF_IFD)
+    latitude, longitude = parse_location(get_ifd(exif, GPS_IFD))
+    return Metadata(
+        width=width,
+        height=height,
+        taken_at=parse_date(
+            details.get(DATE_TIME_ORIGINAL) or
+            details.get(DATE_TIME_DIGITIZED) or exif.get(DATE_TIME),
+            details.get(OFFSET_TIME_ORIGINAL)),
+        camera_make=clean_text(exif.get(MAKE)),
+        camera_model=clean_text(exif.get(MODEL)),
+        latitude=latitude,
+        longitude=longitude,
+    )
+
+
+def get_ifd(exif, tag):
+    # Pillow gives None for a corrupt IFD pointer instead of raising
+    try:
+        return exif.get_ifd(tag) or {}
+    except (OSError, SyntaxError, ValueError):
+        return {}
+
+
+def clean_text(value, max_length=100):
+    if isinstance(value, bytes):
+        value = value.decode('latin-1')
+    if not isinstance(value, str):
+        return ''
+    return value.replace('\x00', '').strip()[:max_length]
+
+
+def parse_date(value, offset=None):
+    # EXIF dates are local time of the camera; without an offset tag they
+    # are read in the default time zone.
+    try:
+        taken_at = datetime.datetime.strptime(
+            clean_text(value), EXIF_DATE_FORMAT)
+    except ValueError:
+        return None
+    offset = clean_text(offset)
+    if offset:
+        try:
+            return datetime.datetime.strptime(
+                f'{taken_at.isoformat()}{offset}', '%Y-%m-%dT%H:%M:%S%z')
+        except ValueError:
+            pass
+    return timezone.make_aware(taken_at)
+
+
+def parse_coordinate(value, ref):
+    try:
+        degrees, minutes, seconds = (float(part) for part in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    return -coordinate if clean_text(ref).upper() in ('S', 'W') \
+        else coordinate
+
+
+def parse_location(gps):
+    latitude = parse_coordinate(
+        gps.get(GPS_LATITUDE), gps.get(GPS_LATITUDE_REF))
+    longitude = parse_coordinate(
+        gps.get(GPS_LONGITUDE), gps.get(GPS_LONGITUDE_REF))
+    if latitude is None or longitude is None or \
+            not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        return None, None
+    return latitude, longitude
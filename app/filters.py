@@ -1,14 +1,92 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
 
+from app import search, tags
 from app.models import Photo
 
 
+class CharInFilter(filters.BaseInFilter, filters.CharFilter):
+    pass
+
+
 class PhotoFilter(filters.FilterSet):
     album = filters.BaseInFilter(
         field_name='album_id', help_text='Фильтрация по id альбома')
-    tags = filters.BaseInFilter(
-        field_name='tags__name', help_text='Фильтрация по тегам')
+    content_hash = CharInFilter(
+        field_name='content_hash',
+        help_text='Фильтрация по SHA-256 содержимого (через запятую)')
+    captured_after = filters.IsoDateTimeFilter(
+        field_name='captured_at', lookup_expr='gte',
+        help_text='Снято (или загружено) не раньше')
+    captured_before = filters.IsoDateTimeFilter(
+        field_name='captured_at', lookup_expr='lte',
+        help_text='Снято (или загружено) не позже')
+    camera_make = filters.CharFilter(help_text='Производитель камеры')
+    camera_model = filters.CharFilter(help_text='Модель камеры')
+    has_location = filters.BooleanFilter(
+        field_name='latitude', lookup_expr='isnull', exclude=True,
+        help_text='Есть координаты съёмки')
+    lat_min = filters.NumberFilter(
+        field_name='latitude', lookup_expr='gte', help_text='Широта от')
+    lat_max = filters.NumberFilter(
+        field_name='latitude', lookup_expr='lte', help_text='Широта до')
+    lon_min = filters.NumberFilter(
+        field_name='longitude', lookup_expr='gte', help_text='Долгота от')
+    lon_max = filters.NumberFilter(
+        field_name='longitude', lookup_expr='lte', help_text='Долгота до')
+    tags = CharInFilter(
+        method='filter_tags',
+        help_text='Фильтрация по тегам (есть хотя бы один из тегов)')
+    tags_all = CharInFilter(
+        method='filter_tags_all',
+        help_text='Фильтрация по тегам (есть все теги)')
+    tags_exclude = CharInFilter(
+        method='filter_tags_exclude',
+        help_text='Исключение фото с любым из тегов')
 
     class Meta:
         model = Photo
-        fields = ['album', 'tags']
+        fields = [
+            'album', 'content_hash', 'captured_after', 'captured_before',
+            'camera_make', 'camera_model', 'has_location', 'lat_min',
+            'lat_max', 'lon_min', 'lon_max', 'tags', 'tags_all',
+            'tags_exclude'
+        ]
+
+    def filter_tags(self, queryset, name, value):
+        return tags.with_any_tags(queryset, value)
+
+    def filter_tags_all(self, queryset, name, value):
+        return tags.with_all_tags(queryset, value)
+
+    def filter_tags_exclude(self, queryset, name, value):
+        return tags.without_tags(queryset, value)
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Full-text ``?q=`` search ranked by relevance. The view names the text
+    field to search in ``search_document_field`` and, optionally, a
+    precomputed ``search_vector_field``. Explicit ``?ordering=`` takes
+    precedence over the rank when the ordering filter runs afterwards.
+    """
+    search_param = 'q'
+    search_description = 'Полнотекстовый поиск'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search.search(
+            queryset, text, view.search_document_field,
+            getattr(view, 'search_vector_field', None)
+        ).order_by('-rank')
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': self.search_description,
+            'schema': {'type': 'string'},
+        }]
@@ -1,15 +1,32 @@
-from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             MemoryFileUploadHandler,
+                                             TemporaryFileUploadHandler)
 
+from app.blobs import ContentHashMixin
 from app.exceptions import UploadSizeError
 from config import settings
 
 
-class SizeLimitUploadHandler(TemporaryFileUploadHandler):
-    def __init__(self, request=None):
-        super().__init__(request)
-
+class SizeLimitUploadHandler(FileUploadHandler):
     def handle_raw_input(
             self, input_data, META, content_length, boundary, encoding=None):
-        if content_length > settings.MAX_UPLOAD_SIZE:
+        if content_length > settings.MAX_REQUEST_UPLOAD_SIZE:
+            raise UploadSizeError
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MAX_UPLOAD_SIZE:
             raise UploadSizeError
-    
\ No newline at end of file
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin,
+                                     MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin,
+                                        TemporaryFileUploadHandler):
+    pass
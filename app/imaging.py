@@ -0,0 +1,25 @@
+from io import BytesIO
+
+from PIL import Image, ImageFilter, ImageOps
+
+THUMBNAIL_SIZE = (150, 150)
+
+
+def resize(source, size, format=None, quality=85, sharpen=False):
+    """
+    Downscale an image to fit ``size`` and return the encoded bytes with
+    the format used. JPEG sources are decoded at a reduced scale (draft
+    mode), so the full-resolution pixels are never held in memory.
+    """
+    with Image.open(source) as image:
+        format = format or image.format
+        image.draft('RGB', size)
+        image.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        image = ImageOps.exif_transpose(image)
+        if sharpen:
+            image = image.filter(ImageFilter.SHARPEN)
+        if format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = BytesIO()
+        image.save(output, format, quality=quality)
+    return output.getvalue(), format
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import zipfile
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import ValidationError
+
+from app import exif, imaging, phash
+from app.blobs import (BLOBS_DIR, THUMBNAILS_DIR, get_content_path,
+                       save_content)
+from app.validators import validate_image
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+# Archives opened by the current worker process, by path
+_archives = {}
+
+
+class ImportedFile(NamedTuple):
+    path: str
+    error: Optional[str] = None
+    content_hash: str = ''
+    photo: str = ''
+    thumbnail: str = ''
+    metadata: exif.Metadata = exif.Metadata()
+    perceptual_hash: Optional[int] = None
+    # The error may pass, so the file is tried again on the next run
+    retry: bool = False
+
+
+def is_image(path):
+    return os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+
+def list_files(source):
+    """
+    Relative paths of the images in a directory tree or a zip archive,
+    in a stable order so an interrupted import can be resumed.
+    """
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            paths = [info.filename for info in archive.infolist()
+                     if not info.is_dir()]
+    else:
+        paths = [
+            os.path.relpath(os.path.join(root, name), source)
+            .replace(os.sep, '/')
+            for root, _, names in os.walk(source) for name in names
+        ]
+    return sorted(path for path in paths if is_image(path) and not any(
+        part.startswith('.') or part == '__MACOSX'
+        for part in path.split('/')))
+
+
+def read_file(source, path):
+    if os.path.isdir(source):
+        with open(os.path.join(source, path), 'rb') as file:
+            return file.read()
+    if source not in _archives:
+        _archives[source] = zipfile.ZipFile(source)
+    return _archives[source].read(path)
+
+
+def process_file(source, path):
+    """
+    Store one image with its thumbnail under content-addressed names and
+    read everything the photo row needs. Runs in the worker processes.
+    """
+    try:
+        content = read_file(source, path)
+        file = BytesIO(content)
+        validate_image(file)
+        content_hash = hashlib.sha256(content).hexdigest()
+        filename = os.path.basename(path)
+        photo = save_content(
+            get_content_path(BLOBS_DIR, content_hash, filename), content)
+        thumbnail_name = get_content_path(
+            THUMBNAILS_DIR, content_hash, filename)
+        if default_storage.exists(thumbnail_name):
+            with default_storage.open(thumbnail_name, 'rb') as stored:
+                thumbnail = stored.read()
+        else:
+            thumbnail, _ = imaging.resize(
+                file, imaging.THUMBNAIL_SIZE, sharpen=True)
+            save_content(thumbnail_name, thumbnail)
+        return ImportedFile(
+            path=path,
+            content_hash=content_hash,
+            photo=photo,
+            thumbnail=thumbnail_name,
+            metadata=exif.read_metadata(file),
+            perceptual_hash=phash.dhash(BytesIO(thumbnail)))
+    except ValidationError as e:
+        return ImportedFile(path=path, error=' '.join(map(str, e.detail)))
+    except OSError as e:
+        return ImportedFile(path=path, error=str(e), retry=True)
+    except Exception as e:
+        # A broken or encrypted archive entry, or a file that trips up
+        # a parser, must not stop the whole import
+        return ImportedFile(path=path, error=f'{type(e).__name__}: {e}')
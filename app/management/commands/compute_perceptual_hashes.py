@@ -0,0 +1,43 @@
+from django.core.management import BaseCommand
+
+from app import phash
+from app.models import Photo
+
+HASH_FIELDS = ['perceptual_hash', *phash.BAND_FIELDS]
+
+
+class Command(BaseCommand):
+    help = 'Вычисление перцептивных хешей для фото, загруженных до их ' \
+           'появления'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        photos = Photo.objects\
+            .filter(perceptual_hash__isnull=True,
+                    thumbnail_status=Photo.ThumbnailStatus.READY)\
+            .exclude(thumbnail='')\
+            .only('id', 'thumbnail')\
+            .order_by('pk')
+        hashes, processed, batch = {}, 0, []
+        for photo in photos.iterator(chunk_size=options['batch_size']):
+            # Photos with identical content share the thumbnail
+            if photo.thumbnail.name not in hashes:
+                try:
+                    with photo.thumbnail.open('rb'):
+                        hashes[photo.thumbnail.name] = \
+                            phash.dhash(photo.thumbnail)
+                except OSError as e:
+                    self.stderr.write(f'photo {photo.pk}: {e}')
+                    continue
+            photo.set_perceptual_hash(hashes[photo.thumbnail.name])
+            batch.append(photo)
+            if len(batch) >= options['batch_size']:
+                Photo.objects.bulk_update(batch, HASH_FIELDS)
+                processed += len(batch)
+                batch = []
+        if batch:
+            Photo.objects.bulk_update(batch, HASH_FIELDS)
+            processed += len(batch)
+        self.stdout.write(f'Photos processed: {processed}')
@@ -0,0 +1,130 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory
+from taggit.models import Tag, TaggedItem
+
+from app.models import Album, Photo
+from app.views import AlbumViewSet, PhotoViewSet
+from config import settings
+
+QUERIES = [
+    ('photos: list', PhotoViewSet, {}),
+    ('photos: ordering=album', PhotoViewSet, {'ordering': 'album'}),
+    ('photos: album filter', PhotoViewSet, {'album': '{album}'}),
+    ('photos: tags filter', PhotoViewSet, {'tags': 'tag0,tag1'}),
+    ('photos: tags_all filter', PhotoViewSet, {'tags_all': 'tag0,tag1'}),
+    ('photos: full-text search', PhotoViewSet, {'q': 'photo'}),
+    ('photos: ordering=-captured_at', PhotoViewSet,
+     {'ordering': '-captured_at'}),
+    ('photos: camera filter', PhotoViewSet, {'camera_make': 'Canon'}),
+    ('albums: list', AlbumViewSet, {}),
+    ('albums: ordering=-photos_count', AlbumViewSet,
+     {'ordering': '-photos_count'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Вывод планов выполнения запросов API на тестовом наборе данных ' \
+           '(данные удаляются после выполнения)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--albums', type=int, default=20,
+                            help='Альбомов на пользователя')
+        parser.add_argument('--photos', type=int, default=200,
+                            help='Фотографий на альбом')
+        parser.add_argument('--offset', type=int, default=1000,
+                            help='Позиция курсора для "глубокой" страницы')
+        parser.add_argument('--analyze', action='store_true',
+                            help='EXPLAIN ANALYZE (только PostgreSQL)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, album = self.seed(options)
+            for name, viewset, params in QUERIES:
+                params = {
+                    key: value.format(album=album.pk)
+                    for key, value in params.items()
+                }
+                self.explain(name, viewset, user, params, options)
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        users = User.objects.bulk_create([
+            User(username=f'explain_queries_{index}')
+            for index in range(options['users'])
+        ])
+        albums = Album.objects.bulk_create([
+            Album(owner=user, title=f'Album {index}')
+            for user in users for index in range(options['albums'])
+        ])
+        photos = Photo.objects.bulk_create([
+            Photo(owner_id=album.owner_id, album=album,
+                  title=f'Photo {index}', photo=f'seed/{index}.jpg',
+                  thumbnail_status=Photo.ThumbnailStatus.READY)
+            for album in albums for index in range(options['photos'])
+        ], batch_size=1000)
+        tags = [Tag.objects.get_or_create(name=f'tag{index}')[0]
+                for index in range(10)]
+        content_type = ContentType.objects.get_for_model(Photo)
+        TaggedItem.objects.bulk_create([
+            TaggedItem(content_type=content_type, object_id=photo.pk,
+                       tag=tags[photo.pk % len(tags)])
+            for photo in photos
+        ], batch_size=1000)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'ANALYZE app_album, app_photo, taggit_taggeditem')
+        return users[0], albums[0]
+
+    @staticmethod
+    def get_host():
+        # Pagination builds absolute URLs, which validate the host
+        for host in settings.ALLOWED_HOSTS:
+            if host and host != '*':
+                return host.lstrip('.')
+        return 'localhost'
+
+    def build_queryset(self, viewset, user, params):
+        view = viewset(action_map={'get': 'list'})
+        factory = APIRequestFactory(SERVER_NAME=self.get_host())
+        request = view.initialize_request(factory.get('/', params))
+        request.user = user
+        view.request, view.args, view.kwargs = request, (), {}
+        view.format_kwarg = None
+        queryset = view.filter_queryset(view.get_queryset())
+        return view.paginator, request, queryset
+
+    def explain(self, name, viewset, user, params, options):
+        paginator, request, queryset = self.build_queryset(
+            viewset, user, params)
+        self.print_plan(
+            name, paginator.get_page_queryset(queryset, request), options)
+        instance = queryset.order_by(*paginator.fields)[
+            options['offset']:options['offset'] + 1].first()
+        if instance is None:
+            return
+        cursor_url = paginator.encode_cursor(instance, reverse=False)
+        params = {**params, **{
+            key: value[0]
+            for key, value in parse_qs(urlparse(cursor_url).query).items()
+        }}
+        paginator, request, queryset = self.build_queryset(
+            viewset, user, params)
+        self.print_plan(
+            f'{name} (cursor at {options["offset"]})',
+            paginator.get_page_queryset(queryset, request), options)
+
+    def print_plan(self, name, queryset, options):
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(str(queryset.query))
+        self.stdout.write(queryset.explain(**explain_options))
+        self.stdout.write('')
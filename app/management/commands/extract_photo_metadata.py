@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand
+
+from app import exif
+from app.models import Photo
+
+METADATA_FIELDS = ['captured_at', *exif.Metadata._fields]
+
+
+class Command(BaseCommand):
+    help = 'Чтение EXIF и размеров для фото, загруженных до их извлечения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перечитать метаданные всех фото')
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.only('id', 'photo', 'uploaded_at')\
+            .order_by('pk')
+        if not options['all']:
+            photos = photos.filter(width__isnull=True)
+        processed, batch = 0, []
+        for photo in photos.iterator(chunk_size=options['batch_size']):
+            try:
+                with photo.photo.open('rb'):
+                    photo.set_metadata(exif.read_metadata(photo.photo))
+            except OSError as e:
+                self.stderr.write(f'photo {photo.pk}: {e}')
+                continue
+            batch.append(photo)
+            if len(batch) >= options['batch_size']:
+                Photo.objects.bulk_update(batch, METADATA_FIELDS)
+                processed += len(batch)
+                batch = []
+        if batch:
+            Photo.objects.bulk_update(batch, METADATA_FIELDS)
+            processed += len(batch)
+        self.stdout.write(f'Photos processed: {processed}')
@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+
+from app import tasks
+from app.models import Photo
+
+
+class Command(BaseCommand):
+    help = 'Генерация миниатюр, не созданных фоновыми задачами'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--failed', action='store_true',
+            help='Также повторить генерацию для фото со статусом "failed"')
+
+    def handle(self, *args, **options):
+        statuses = [Photo.ThumbnailStatus.PENDING]
+        if options['failed']:
+            statuses.append(Photo.ThumbnailStatus.FAILED)
+        photo_ids = Photo.objects.filter(thumbnail_status__in=statuses)\
+            .values_list('id', flat=True)
+        processed = 0
+        for photo_id in photo_ids.iterator():
+            try:
+                tasks.generate_thumbnail(photo_id)
+            except Exception as e:
+                self.stderr.write(f'photo {photo_id}: {e}')
+            else:
+                processed += 1
+        self.stdout.write(f'Thumbnails generated: {processed}')
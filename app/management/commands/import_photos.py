@@ -0,0 +1,131 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from app import bulk, importer, search, tasks
+from app.caching import invalidate_user
+from app.models import Album, Photo
+
+
+class Command(BaseCommand):
+    help = 'Импорт фотографий из каталога или zip-архива: папки верхнего ' \
+           'уровня становятся альбомами, вложенные - тегами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Каталог или zip-архив')
+        parser.add_argument('--user', required=True,
+                            help='Имя пользователя - владельца фото')
+        parser.add_argument('--album',
+                            help='Альбом для файлов вне папок (по умолчанию '
+                                 '- имя каталога или архива)')
+        parser.add_argument('--tags', nargs='*', default=[],
+                            help='Теги для всех фото')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Процессов для хеширования и миниатюр')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--checkpoint',
+                            help='Файл с уже импортированными путями (по '
+                                 'умолчанию - рядом с источником)')
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['source'])
+        if not os.path.exists(source):
+            raise CommandError(f'{source} does not exist')
+        owner = User.objects.filter(username=options['user']).first()
+        if owner is None:
+            raise CommandError(f'user {options["user"]} not found')
+        self.owner, self.albums = owner, {}
+        self.default_album = options['album'] or \
+            os.path.splitext(os.path.basename(source))[0]
+        checkpoint = options['checkpoint'] or f'{source}.import-progress'
+        done = self.read_checkpoint(checkpoint)
+        pending = [path for path in importer.list_files(source)
+                   if path not in done]
+        self.stdout.write(
+            f'{len(pending)} files to import, {len(done)} already imported')
+        imported = failed = 0
+        results = self.process_files(source, pending, options['workers'])
+        while batch := list(islice(results, options['batch_size'])):
+            failed += self.report_errors(batch)
+            imported += self.save_batch(batch, options['tags'])
+            with open(checkpoint, 'a') as file:
+                file.writelines(f'{result.path}\n' for result in batch
+                                if not result.retry)
+            self.stdout.write(
+                f'{imported + failed}/{len(pending)} files processed')
+        tasks.refresh_albums(album.pk for album in self.albums.values())
+        invalidate_user(owner.pk)
+        self.stdout.write(
+            f'Photos imported: {imported}, files failed: {failed}')
+
+    @staticmethod
+    def process_files(source, paths, workers):
+        # Files are processed ahead in the pool while a finished batch is
+        # being saved
+        process = partial(importer.process_file, source)
+        if workers <= 1:
+            yield from map(process, paths)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(process, paths, chunksize=8)
+
+    @staticmethod
+    def read_checkpoint(checkpoint):
+        if not os.path.exists(checkpoint):
+            return set()
+        with open(checkpoint) as file:
+            return set(file.read().splitlines())
+
+    def report_errors(self, batch):
+        failed = 0
+        for result in batch:
+            if result.error:
+                retry = ' (will be retried)' if result.retry else ''
+                self.stderr.write(f'{result.path}: {result.error}{retry}')
+                failed += 1
+        return failed
+
+    def get_album(self, title):
+        title = title[:255]
+        if title not in self.albums:
+            self.albums[title] = Album.objects\
+                .filter(owner=self.owner, title=title)\
+                .order_by('pk').first() or \
+                Album.objects.create(owner=self.owner, title=title)
+        return self.albums[title]
+
+    def save_batch(self, batch, tags):
+        photos, photo_tags = [], []
+        for result in batch:
+            if result.error:
+                continue
+            *folders, filename = result.path.split('/')
+            photo = Photo(
+                owner=self.owner,
+                album=self.get_album(
+                    folders[0] if folders else self.default_album),
+                title=os.path.splitext(filename)[0][:255],
+                content_hash=result.content_hash,
+                photo=result.photo,
+                thumbnail=result.thumbnail,
+                thumbnail_status=Photo.ThumbnailStatus.READY)
+            photo.set_metadata(result.metadata)
+            photo.set_perceptual_hash(result.perceptual_hash)
+            photos.append(photo)
+            photo_tags.append([tag[:100] for tag in [*folders[1:], *tags]])
+        with transaction.atomic():
+            Photo.objects.bulk_create(photos)
+            Album.change_photos_count(
+                Counter(photo.album_id for photo in photos))
+            bulk.replace_tags({
+                photo.pk: names
+                for photo, names in zip(photos, photo_tags) if names
+            })
+        search.update_photo_documents([photo.pk for photo in photos])
+        return len(photos)
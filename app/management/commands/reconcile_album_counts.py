@@ -0,0 +1,73 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from app.caching import invalidate_user
+from app.models import Album, Photo
+
+
+class Command(BaseCommand):
+    help = 'Сверка счётчиков фото в альбомах с фактическим числом фото ' \
+           'и исправление расхождений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Альбомов на один запрос к базе')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только вывести найденные расхождения')
+
+    def handle(self, *args, **options):
+        albums = Album.objects\
+            .only('id', 'owner_id', 'photos_count')\
+            .order_by('pk')
+        checked, drifted, owners = 0, [], set()
+        batch = []
+        for album in albums.iterator(chunk_size=options['batch_size']):
+            batch.append(album)
+            if len(batch) >= options['batch_size']:
+                drifted += self.check(batch, owners)
+                checked += len(batch)
+                batch = []
+        if batch:
+            drifted += self.check(batch, owners)
+            checked += len(batch)
+        if drifted and not options['dry_run']:
+            self.fix(drifted)
+            for owner_id in owners:
+                invalidate_user(owner_id)
+        action = 'found' if options['dry_run'] else 'fixed'
+        self.stdout.write(
+            f'{checked} albums checked, {len(drifted)} counters {action}')
+
+    def check(self, batch, owners):
+        counts = dict(Photo.objects
+                      .filter(album_id__in=[album.pk for album in batch])
+                      .values('album_id')
+                      .annotate(count=Count('pk'))
+                      .values_list('album_id', 'count')
+                      .order_by())
+        drifted = []
+        for album in batch:
+            count = counts.get(album.pk, 0)
+            if album.photos_count != count:
+                self.stdout.write(
+                    f'album {album.pk}: {album.photos_count} -> {count}')
+                drifted.append(album.pk)
+                owners.add(album.owner_id)
+        return drifted
+
+    @staticmethod
+    def fix(album_ids):
+        # The count is taken again in the update itself, so photos added
+        # or removed since the check are not lost
+        count = Photo.objects\
+            .filter(album_id=OuterRef('pk'))\
+            .values('album_id')\
+            .annotate(count=Count('pk'))\
+            .values('count')\
+            .order_by()
+        with transaction.atomic():
+            Album.objects.filter(pk__in=album_ids).update(
+                photos_count=Coalesce(
+                    Subquery(count, output_field=IntegerField()), 0))
@@ -0,0 +1,118 @@
+import posixpath
+import re
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from app.blobs import BLOBS_DIR, THUMBNAILS_DIR
+from app.models import Photo
+from app.renditions import RENDITIONS_DIR, get_source_key
+
+CONTENT_DIRS = (BLOBS_DIR, THUMBNAILS_DIR)
+
+CONTENT_HASH_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class Command(BaseCommand):
+    help = 'Удаление файлов из хранилища, на которые не ссылается ни одна ' \
+           'фотография'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Файлов на один запрос к базе')
+        parser.add_argument('--min-age', type=int, default=24,
+                            help='Не удалять файлы моложе N часов '
+                                 '(загрузки, которые ещё не сохранены)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только вывести найденные файлы')
+
+    def handle(self, *args, **options):
+        self.legacy_source_keys = None
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+        scanned = orphaned = 0
+        batch = []
+        for name in self.walk(''):
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                orphaned += self.sweep(batch, cutoff, options)
+                scanned += len(batch)
+                batch = []
+        if batch:
+            orphaned += self.sweep(batch, cutoff, options)
+            scanned += len(batch)
+        action = 'found' if options['dry_run'] else 'deleted'
+        self.stdout.write(
+            f'{scanned} files scanned, {orphaned} orphaned files {action}')
+
+    def walk(self, path):
+        dirs, files = default_storage.listdir(path)
+        if path:
+            for name in sorted(files):
+                yield posixpath.join(path, name)
+        for name in sorted(dirs):
+            yield from self.walk(posixpath.join(path, name))
+
+    def sweep(self, batch, cutoff, options):
+        orphaned = 0
+        for name in self.find_orphans(batch):
+            if default_storage.get_modified_time(name) > cutoff:
+                continue
+            orphaned += 1
+            if options['verbosity'] > 1 or options['dry_run']:
+                self.stdout.write(name)
+            if not options['dry_run']:
+                default_storage.delete(name)
+        return orphaned
+
+    def find_orphans(self, batch):
+        renditions, content, legacy = {}, {}, []
+        for name in batch:
+            parts = name.split('/')
+            if parts[0] == RENDITIONS_DIR:
+                # renditions/<aa>/<source key>/<rendition>, anything else
+                # is left from an older layout
+                renditions[name] = parts[2] if len(parts) == 4 else None
+            elif parts[0] in CONTENT_DIRS and \
+                    CONTENT_HASH_RE.match(posixpath.splitext(parts[-1])[0]):
+                content[name] = posixpath.splitext(parts[-1])[0]
+            else:
+                legacy.append(name)
+        referenced = set()
+        condition = Q()
+        if content:
+            condition |= Q(content_hash__in=set(content.values()))
+        if legacy:
+            condition |= Q(photo__in=legacy) | Q(thumbnail__in=legacy)
+        if condition:
+            for photo, thumbnail in Photo.objects.filter(condition)\
+                    .values_list('photo', 'thumbnail'):
+                referenced.update([photo, thumbnail])
+        source_keys = set()
+        if renditions:
+            source_keys.update(Photo.objects
+                               .filter(content_hash__in=set(
+                                   renditions.values()))
+                               .values_list('content_hash', flat=True))
+        orphans = [name for name in [*content, *legacy]
+                   if name not in referenced]
+        for name, source_key in renditions.items():
+            if source_key in source_keys:
+                continue
+            if source_key and source_key in self.get_legacy_source_keys():
+                continue
+            orphans.append(name)
+        return orphans
+
+    def get_legacy_source_keys(self):
+        # Renditions of photos stored before content hashing are keyed by
+        # a digest of the file name.
+        if self.legacy_source_keys is None:
+            self.legacy_source_keys = {
+                get_source_key('', name)
+                for name in Photo.objects.filter(content_hash='')
+                .values_list('photo', flat=True).iterator()
+            }
+        return self.legacy_source_keys
@@ -0,0 +1,173 @@
+import hashlib
+import mimetypes
+import re
+import time
+from urllib.parse import quote
+
+from django.core.files.storage import default_storage
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.http import parse_etags, urlencode
+from rest_framework import status
+
+from config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_version(name):
+    # Stored files are never overwritten, so the name identifies the
+    # content and can be used as a cache-busting token and an ETag.
+    return hashlib.sha256(name.encode()).hexdigest()[:16]
+
+
+def get_etag(name):
+    return f'"{get_version(name)}"'
+
+
+def get_signing_epoch(now=None):
+    # URLs signed within one bucket are identical, so clients and edge
+    # caches keep hitting the same URL until the bucket rolls over.
+    now = int(time.time() if now is None else now)
+    return now - now % settings.MEDIA_SIGNED_URL_BUCKET
+
+
+def get_expires(now=None):
+    return get_signing_epoch(now) + settings.MEDIA_SIGNED_URL_BUCKET + \
+        settings.MEDIA_SIGNED_URL_TTL
+
+
+def get_signature(name, expires):
+    return salted_hmac(
+        'app.media.signed-url', f'{name}:{expires}',
+        secret=settings.MEDIA_SIGNING_KEY, algorithm='sha256').hexdigest()
+
+
+def get_signed_url(name, request=None):
+    expires = get_expires()
+    url = reverse('media', kwargs={'name': name}) + '?' + urlencode({
+        'expires': expires, 'signature': get_signature(name, expires)})
+    return request.build_absolute_uri(url) if request else url
+
+
+def check_signature(name, expires, signature):
+    """
+    Return the number of seconds a signed URL stays valid, or ``None``
+    when the signature does not match or has expired.
+    """
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return None
+    if not signature or not constant_time_compare(
+            signature, get_signature(name, expires)):
+        return None
+    remaining = expires - int(time.time())
+    return remaining if remaining > 0 else None
+
+
+def parse_range(header, size):
+    """
+    Return the ``(first, last)`` byte positions of a single-range
+    ``Range`` header, ``None`` to send the whole file, or raise
+    ``ValueError`` when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError('unsatisfiable suffix range')
+        return max(size - length, 0), size - 1
+    first = int(first)
+    if last and int(last) < first:
+        return None
+    if first >= size:
+        raise ValueError('range starts after the end of the file')
+    last = min(int(last), size - 1) if last else size - 1
+    return first, last
+
+
+def read_range(file, first, last):
+    try:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            data = file.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def serve(request, name, content_type=None, cache_control=None):
+    """
+    Send a stored file to a client that has already been authorized.
+
+    The transfer is handed off to the web server with ``X-Accel-Redirect``
+    or ``X-Sendfile`` when ``MEDIA_SERVE_BACKEND`` says so, otherwise the
+    file is streamed from the storage with support for single byte ranges.
+    """
+    etag = get_etag(name)
+    headers = {
+        'ETag': etag,
+        'Cache-Control': cache_control or
+        f'private, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable',
+        'Accept-Ranges': 'bytes',
+    }
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if '*' in etags or etag in etags:
+            return HttpResponse(
+                status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    content_type = content_type or mimetypes.guess_type(name)[0] or \
+        'application/octet-stream'
+    backend = settings.MEDIA_SERVE_BACKEND
+    if backend == 'x-accel-redirect':
+        headers['X-Accel-Redirect'] = \
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+        return HttpResponse(content_type=content_type, headers=headers)
+    if backend == 'x-sendfile':
+        headers['X-Sendfile'] = default_storage.path(name)
+        return HttpResponse(content_type=content_type, headers=headers)
+    return serve_file(request, name, content_type, headers)
+
+
+def serve_file(request, name, content_type, headers):
+    try:
+        size = default_storage.size(name)
+    except FileNotFoundError:
+        raise Http404
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range == headers['ETag']:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            headers['Content-Range'] = f'bytes */{size}'
+            return HttpResponse(
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers=headers)
+    file = default_storage.open(name, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        first, last = byte_range
+        response = StreamingHttpResponse(
+            read_range(file, first, last),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=content_type)
+        response['Content-Length'] = last - first + 1
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,32 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:18
+
+import app.models
+from django.db import migrations, models
+import easy_thumbnails.fields
+
+
+def mark_existing_thumbnails_ready(apps, schema_editor):
+    Photo = apps.get_model('app', 'Photo')
+    Photo.objects.exclude(thumbnail='').update(thumbnail_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('pending', 'В обработке'), ('ready', 'Готова'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус миниатюры'),
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='thumbnail',
+            field=easy_thumbnails.fields.ThumbnailerImageField(blank=True, upload_to=app.models.get_thumbnail_upload_path, verbose_name='Миниатюра'),
+        ),
+        migrations.RunPython(
+            mark_existing_thumbnails_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_uploadsession'),
+        ('taggit', '0005_auto_20220424_2025'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS taggit_taggeditem_ct_tag_obj_idx '
+            'ON taggit_taggeditem (content_type_id, tag_id, object_id);',
+            'DROP INDEX IF EXISTS taggit_taggeditem_ct_tag_obj_idx;'
+        ),
+    ]
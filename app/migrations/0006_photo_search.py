@@ -0,0 +1,66 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:35
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+from config import settings
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS photo_search_vector_idx '
+            'ON app_photo USING gin (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS photo_search_vector_idx')
+
+
+def fill_search_documents(apps, schema_editor):
+    Photo = apps.get_model('app', 'Photo')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    content_type = ContentType.objects.filter(
+        app_label='app', model='photo').first()
+    tags = {}
+    if content_type is not None:
+        for object_id, name in TaggedItem.objects\
+                .filter(content_type=content_type)\
+                .values_list('object_id', 'tag__name'):
+            tags.setdefault(object_id, []).append(name)
+    photos = list(Photo.objects.select_related('album'))
+    for photo in photos:
+        parts = [photo.title, photo.album.title, *tags.get(photo.pk, [])]
+        photo.search_document = '\n'.join(p for p in parts if p).lower()
+    Photo.objects.bulk_update(photos, ['search_document'], batch_size=500)
+    if schema_editor.connection.vendor == 'postgresql':
+        Photo.objects.update(search_vector=SearchVector(
+            'search_document', config=settings.SEARCH_CONFIG))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_owner_composite_indexes'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0005_auto_20220424_2025'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(
+            fill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:48
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def fill_captured_at(apps, schema_editor):
+    Photo = apps.get_model('app', 'Photo')
+    Photo.objects.update(captured_at=F('uploaded_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_photo_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='camera_make',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Производитель камеры'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='camera_model',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Модель камеры'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='captured_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Дата съёмки из EXIF, если её нет - дата загрузки', verbose_name='Дата съёмки или загрузки'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Долгота'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='taken_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата съёмки'),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина'),
+        ),
+        migrations.RunPython(fill_captured_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['owner', 'captured_at', 'id'], name='photo_owner_captured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['owner', 'camera_make', 'camera_model'], name='photo_owner_camera_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['owner', 'latitude', 'longitude'], name='photo_owner_location_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.1.2 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='hash_band_0',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='hash_band_1',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='hash_band_2',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='hash_band_3',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='dHash миниатюры для поиска похожих фото', null=True, verbose_name='Перцептивный хеш'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['owner', 'hash_band_0'], name='photo_owner_hash_band_0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['owner', 'hash_band_1'], name='photo_owner_hash_band_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['owner', 'hash_band_2'], name='photo_owner_hash_band_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['owner', 'hash_band_3'], name='photo_owner_hash_band_3_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.1.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+PREVIEW_SIZE = 4
+
+
+def fill_album_preview(apps, schema_editor):
+    Album = apps.get_model('app', 'Album')
+    Photo = apps.get_model('app', 'Photo')
+    stats = {
+        album_id: (count, last_uploaded_at)
+        for album_id, count, last_uploaded_at in Photo.objects
+        .values('album_id')
+        .annotate(count=Count('pk'), last_uploaded_at=Max('uploaded_at'))
+        .values_list('album_id', 'count', 'last_uploaded_at')
+        .order_by()
+    }
+    albums = list(Album.objects.filter(pk__in=stats))
+    for album in albums:
+        album.photos_count, album.last_uploaded_at = stats[album.pk]
+        album.preview = [
+            {'id': pk, 'thumbnail': thumbnail}
+            for pk, thumbnail in Photo.objects
+            .filter(album_id=album.pk)
+            .order_by('-uploaded_at', '-pk')
+            .values_list('pk', 'thumbnail')[:PREVIEW_SIZE]
+        ]
+    Album.objects.bulk_update(
+        albums, ['photos_count', 'last_uploaded_at', 'preview'],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_photo_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='last_uploaded_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата последней загрузки'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='photos_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Кол-во фото'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='preview',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Последние фото альбома: [{"id": ..., "thumbnail": ...}]', verbose_name='Превью'),
+        ),
+        migrations.RunPython(
+            fill_album_preview, migrations.RunPython.noop),
+    ]
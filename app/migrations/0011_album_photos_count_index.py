@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_album_preview'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(fields=['owner', 'photos_count', 'id'], name='album_owner_photos_count_idx'),
+        ),
+    ]
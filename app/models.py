@@ -1,21 +1,27 @@
 import os
+import uuid
 
-from django.contrib.admin import display
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from easy_thumbnails.fields import ThumbnailerImageField
 from taggit.managers import TaggableManager
 
+from app import exif, phash
+from app.blobs import (BLOBS_DIR, THUMBNAILS_DIR, get_content_hash,
+                       get_content_path, lock_content, save_content)
 from config import settings
 
 
 def get_photo_upload_path(instance, filename):
-    return f'user_{instance.owner.id}/album_{instance.album.id}/{filename}'
+    return get_content_path(BLOBS_DIR, instance.content_hash, filename)
 
 
 def get_thumbnail_upload_path(instance, filename):
-    return f'user_{instance.owner.id}/album_{instance.album.id}/' \
-           f'thumbnails/thumb_{filename}'
+    return get_content_path(THUMBNAILS_DIR, instance.content_hash, filename)
 
 
 class Album(models.Model):
@@ -24,28 +30,62 @@ class Album(models.Model):
         User,
         on_delete=models.CASCADE,
         verbose_name='Владелец',
-        related_name='albums'
+        related_name='albums',
+        db_index=False
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    
-    @property
-    @display(description='Кол-во фото')
-    def photos_amount(self) -> int:
-        return self.photos.count()
-    
-    def __str__(self):
-        return f'{self.title} ({self.id})'
+    photos_count = models.PositiveIntegerField(
+        'Кол-во фото', default=0, editable=False)
+    last_uploaded_at = models.DateTimeField(
+        'Дата последней загрузки', null=True, blank=True, editable=False)
+    preview = models.JSONField(
+        'Превью', default=list, blank=True, editable=False,
+        help_text='Последние фото альбома: [{"id": ..., "thumbnail": ...}]')
     
     class Meta:
         verbose_name = 'Альбом'
         verbose_name_plural = 'Альбомы'
+        indexes = [
+            models.Index(
+                fields=['owner', 'created_at', 'id'],
+                name='album_owner_created_idx'),
+            models.Index(
+                fields=['owner', 'photos_count', 'id'],
+                name='album_owner_photos_count_idx'),
+        ]
+    
+    @classmethod
+    def change_photos_count(cls, changes):
+        """
+        Add ``changes``, a mapping of album ids to the number of photos
+        added (or removed, when negative), to the stored counters in one
+        atomic update.
+        """
+        changes = {pk: change for pk, change in changes.items()
+                   if pk is not None and change}
+        if not changes:
+            return
+        change = Case(*(When(pk=pk, then=Value(change))
+                        for pk, change in changes.items()),
+                      output_field=models.IntegerField())
+        cls.objects.filter(pk__in=changes).update(
+            photos_count=Greatest(F('photos_count') + change, 0))
+    
+    def __str__(self):
+        return f'{self.title} ({self.id})'
         
 
 class Photo(models.Model):
+    class ThumbnailStatus(models.TextChoices):
+        PENDING = 'pending', 'В обработке'
+        READY = 'ready', 'Готова'
+        FAILED = 'failed', 'Ошибка'
+    
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        verbose_name='Владелец'
+        verbose_name='Владелец',
+        db_index=False
     )
     album = models.ForeignKey(
         Album,
@@ -56,19 +96,171 @@ class Photo(models.Model):
     title = models.CharField(
         'Название', max_length=255)
     photo = models.ImageField('Фото', upload_to=get_photo_upload_path)
+    content_hash = models.CharField(
+        'SHA-256 содержимого',
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False)
     thumbnail = ThumbnailerImageField(
         'Миниатюра',
         upload_to=get_thumbnail_upload_path,
-        resize_source=dict(size=(150, 150), sharpen=True))
+        blank=True)
+    thumbnail_status = models.CharField(
+        'Статус миниатюры',
+        max_length=16,
+        choices=ThumbnailStatus.choices,
+        default=ThumbnailStatus.PENDING)
     tags = TaggableManager('Теги', blank=True)
     uploaded_at = models.DateTimeField('Дата загрузки', auto_now_add=True)
+    taken_at = models.DateTimeField('Дата съёмки', null=True, blank=True)
+    captured_at = models.DateTimeField(
+        'Дата съёмки или загрузки',
+        default=timezone.now,
+        help_text='Дата съёмки из EXIF, если её нет - дата загрузки')
+    width = models.PositiveIntegerField('Ширина', null=True, blank=True)
+    height = models.PositiveIntegerField('Высота', null=True, blank=True)
+    camera_make = models.CharField('Производитель камеры', max_length=100,
+                                   blank=True)
+    camera_model = models.CharField('Модель камеры', max_length=100,
+                                    blank=True)
+    latitude = models.FloatField('Широта', null=True, blank=True)
+    longitude = models.FloatField('Долгота', null=True, blank=True)
+    search_document = models.TextField(
+        'Поисковый документ', blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    perceptual_hash = models.BigIntegerField(
+        'Перцептивный хеш', null=True, blank=True, editable=False,
+        help_text='dHash миниатюры для поиска похожих фото')
+    hash_band_0 = models.PositiveIntegerField(null=True, editable=False)
+    hash_band_1 = models.PositiveIntegerField(null=True, editable=False)
+    hash_band_2 = models.PositiveIntegerField(null=True, editable=False)
+    hash_band_3 = models.PositiveIntegerField(null=True, editable=False)
     
     class Meta:
         verbose_name = 'Фотография'
         verbose_name_plural = 'Фотографии'
+        indexes = [
+            models.Index(
+                fields=['owner', 'uploaded_at', 'id'],
+                name='photo_owner_uploaded_idx'),
+            models.Index(
+                fields=['owner', 'album', 'uploaded_at'],
+                name='photo_owner_album_idx'),
+            models.Index(
+                fields=['owner', 'captured_at', 'id'],
+                name='photo_owner_captured_idx'),
+            models.Index(
+                fields=['owner', 'camera_make', 'camera_model'],
+                name='photo_owner_camera_idx'),
+            models.Index(
+                fields=['owner', 'latitude', 'longitude'],
+                name='photo_owner_location_idx'),
+            *(models.Index(fields=['owner', field],
+                           name=f'photo_owner_{field}_idx')
+              for field in phash.BAND_FIELDS),
+        ]
     
     def save(self, *args, **kwargs):
-        if self.photo.file is not None:
-            self.thumbnail = self.photo.file
-        return super().save(*args, **kwargs)
-    
\ No newline at end of file
+        photo_changed = bool(self.photo) and not self.photo._committed
+        if photo_changed:
+            self.store_content()
+        super().save(*args, **kwargs)
+        if photo_changed:
+            transaction.on_commit(self.restore_content)
+        if photo_changed and \
+                self.thumbnail_status == self.ThumbnailStatus.PENDING:
+            from app import tasks
+            tasks.enqueue(tasks.generate_thumbnail, self.pk)
+    
+    def set_metadata(self, metadata):
+        for field, value in metadata._asdict().items():
+            setattr(self, field, value)
+        self.captured_at = self.taken_at or self.uploaded_at or timezone.now()
+    
+    def set_perceptual_hash(self, value):
+        for field, field_value in phash.get_hash_fields(value).items():
+            setattr(self, field, field_value)
+    
+    @classmethod
+    def find_thumbnail(cls, content_hash):
+        # Thumbnail name and perceptual hash of identical content, if any
+        return cls.objects\
+            .filter(content_hash=content_hash,
+                    thumbnail_status=cls.ThumbnailStatus.READY)\
+            .exclude(thumbnail='')\
+            .values_list('thumbnail', 'perceptual_hash')\
+            .first()
+    
+    def store_content(self):
+        """
+        Hash a newly assigned file and store it, reusing the blob and the
+        thumbnail of identical content instead of saving them again.
+        """
+        self.content_hash = get_content_hash(self.photo.file)
+        # Kept for restore_content, the stored blob may be released before
+        # this photo is committed
+        self._content_file = self.photo.file
+        self.set_metadata(exif.read_metadata(self.photo.file))
+        name = self.photo.field.generate_filename(self, self.photo.name)
+        if self.photo.storage.exists(name):
+            self.photo.name = name
+            self.photo._committed = True
+        else:
+            self.photo.save(self.photo.name, self.photo.file, save=False)
+        found = self.find_thumbnail(self.content_hash)
+        if found:
+            self.thumbnail, perceptual_hash = found
+            self.set_perceptual_hash(perceptual_hash)
+            self.thumbnail_status = self.ThumbnailStatus.READY
+        else:
+            self.thumbnail = None
+            self.thumbnail_status = self.ThumbnailStatus.PENDING
+    
+    def restore_content(self):
+        """
+        Store again the files reused by ``store_content`` that were
+        released with a deleted photo of the same content before this one
+        was committed. Runs once the photo is committed.
+        """
+        with transaction.atomic():
+            # A release that has not checked the references yet will find
+            # this photo, one that has already deleted the files is over
+            lock_content(self.content_hash)
+            save_content(self.photo.name, self._content_file)
+            thumbnail_lost = bool(self.thumbnail) and \
+                not self.thumbnail.storage.exists(self.thumbnail.name)
+        if thumbnail_lost and Photo.objects\
+                .filter(pk=self.pk, thumbnail=self.thumbnail.name)\
+                .update(thumbnail='',
+                        thumbnail_status=self.ThumbnailStatus.PENDING):
+            from app import tasks
+            tasks.enqueue(tasks.generate_thumbnail, self.pk)
+
+
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Владелец'
+    )
+    album = models.ForeignKey(
+        Album,
+        on_delete=models.CASCADE,
+        verbose_name='Альбом'
+    )
+    title = models.CharField('Название', max_length=255)
+    tags = models.JSONField('Теги', default=list, blank=True)
+    filename = models.CharField('Имя файла', max_length=255)
+    size = models.PositiveBigIntegerField('Размер файла')
+    offset = models.PositiveBigIntegerField('Загружено байт', default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Сессия загрузки'
+        verbose_name_plural = 'Сессии загрузки'
+    
+    @property
+    def part_path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{self.id}.part')
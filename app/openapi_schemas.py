@@ -1,8 +1,25 @@
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 
-from app.serializers import PhotoSerializer, PhotoUpdateSchemaSerializer
+from app.serializers import (
+	DuplicateGroupSerializer,
+	PhotoBulkCreateSerializer,
+	PhotoBulkResultSerializer,
+	PhotoBulkUpdateItemSerializer,
+	PhotoMoveResultSerializer,
+	PhotoMoveSerializer,
+	PhotoSerializer,
+	PhotoUpdateSchemaSerializer,
+	SimilarPhotoSerializer,
+	UploadSessionSerializer
+)
 from users.serializers import ErrorDetailSerializer
 
+DISTANCE_PARAMETER = OpenApiParameter(
+	name='distance', type=int,
+	description='Максимальное число различающихся бит хеша, от 0 до 12. '
+							'По умолчанию 6 для похожих фото и 3 для дубликатов')
+
 ALBUM_VIEWSET = {
 	'list': extend_schema(
 		summary='Получение списка альбомов',
@@ -20,6 +37,18 @@ ALBUM_VIEWSET = {
 	'retrieve': extend_schema(summary='Получение альбома'),
 	'partial_update': extend_schema(summary='Редактирование названия альбома'),
 	'destroy': extend_schema(summary='Удаление альбома'),
+	'download': extend_schema(
+		summary='Скачивание альбома ZIP-архивом',
+		description='Архив без сжатия формируется во время передачи. '
+								'Поддерживаются заголовки Range и If-Range для '
+								'продолжения прерванной загрузки.',
+		responses={
+			(200, 'application/zip'): OpenApiTypes.BINARY,
+			(206, 'application/zip'): OpenApiTypes.BINARY,
+			404: ErrorDetailSerializer,
+			416: None
+		},
+	),
 }
 
 PHOTO_VIEWSET = {
@@ -28,9 +57,10 @@ PHOTO_VIEWSET = {
 		parameters=[
 			OpenApiParameter(
 				name='ordering',
-				description='Сортировка по альбому и/или дате загрузки',
+				description='Сортировка по альбому, дате загрузки или дате '
+										'съёмки (captured_at)',
 				location='query',
-				enum=['uploaded_at', 'album'],
+				enum=['uploaded_at', 'captured_at', 'album'],
 				many=True
 			)
 		]
@@ -56,4 +86,150 @@ PHOTO_VIEWSET = {
 		request=PhotoUpdateSchemaSerializer,
 	),
 	'destroy': extend_schema(summary='Удаление фотографии'),
+	'bulk_create': extend_schema(
+		summary='Загрузка нескольких фотографий в альбом',
+		request={'multipart/form-data': PhotoBulkCreateSerializer},
+		responses={
+			201: PhotoBulkResultSerializer(many=True),
+			404: ErrorDetailSerializer,
+			413: ErrorDetailSerializer
+		},
+	),
+	'move': extend_schema(
+		summary='Перенос фотографий в другой альбом',
+		description='Файлы не перезаписываются: путь к файлу не зависит от '
+								'альбома. Фотографии, не найденные у пользователя, '
+								'перечисляются в not_found.',
+		request=PhotoMoveSerializer,
+		responses={
+			200: PhotoMoveResultSerializer,
+			400: ErrorDetailSerializer,
+			404: ErrorDetailSerializer
+		},
+	),
+	'original': extend_schema(
+		summary='Получение оригинала фотографии',
+		description='Поддерживаются заголовки Range и If-None-Match. Ссылка '
+								'с актуальным параметром v возвращается в поле photo.',
+		responses={
+			(200, 'image/*'): OpenApiTypes.BINARY,
+			(206, 'image/*'): OpenApiTypes.BINARY,
+			304: None,
+			404: ErrorDetailSerializer,
+			416: None
+		},
+	),
+	'thumbnail': extend_schema(
+		summary='Получение миниатюры фотографии',
+		description='Ссылка с актуальным параметром v возвращается в поле '
+								'thumbnail, пока миниатюра не готова - 404.',
+		responses={
+			(200, 'image/*'): OpenApiTypes.BINARY,
+			304: None,
+			404: ErrorDetailSerializer
+		},
+	),
+	'rendition': extend_schema(
+		summary='Получение уменьшенной копии фотографии',
+		description='Копия создаётся при первом запросе и сохраняется в '
+								'хранилище. Доступные варианты перечислены в поле '
+								'renditions фотографии.',
+		responses={
+			(200, 'image/*'): OpenApiTypes.BINARY,
+			404: ErrorDetailSerializer
+		},
+	),
+	'similar': extend_schema(
+		summary='Поиск похожих фотографий',
+		description='Фотографии пользователя, перцептивный хеш миниатюры '
+								'которых отличается не более чем на distance бит, '
+								'от самых похожих. Пока миниатюра не готова, список '
+								'пуст.',
+		parameters=[DISTANCE_PARAMETER],
+		responses={
+			200: SimilarPhotoSerializer(many=True),
+			400: ErrorDetailSerializer,
+			404: ErrorDetailSerializer
+		},
+	),
+	'duplicates': extend_schema(
+		summary='Отчёт о дубликатах',
+		description='Группы почти одинаковых фотографий пользователя, от '
+								'самых больших.',
+		parameters=[DISTANCE_PARAMETER],
+		responses={
+			200: DuplicateGroupSerializer(many=True),
+			400: ErrorDetailSerializer
+		},
+	),
+}
+
+PHOTO_BULK_UPDATE = extend_schema(
+	summary='Редактирование нескольких фотографий',
+	description='Название, теги и альбом каждой фотографии. Результат '
+							'возвращается для каждого элемента отдельно.',
+	request=PhotoBulkUpdateItemSerializer(many=True),
+	responses={200: PhotoBulkResultSerializer(many=True)},
+)
+
+UPLOAD_VIEWSET = {
+	'create': extend_schema(
+		summary='Создание сессии загрузки файла по частям',
+		responses={
+			201: UploadSessionSerializer,
+			404: ErrorDetailSerializer,
+			413: ErrorDetailSerializer
+		},
+	),
+	'retrieve': extend_schema(
+		summary='Получение состояния загрузки (смещения для продолжения)'
+	),
+	'update': extend_schema(
+		summary='Загрузка части файла',
+		description='Тело запроса - байты файла, начиная с текущего смещения '
+								'сессии (поле offset).',
+		request={'application/octet-stream': OpenApiTypes.BINARY},
+		parameters=[
+			OpenApiParameter(
+				name='Content-Range',
+				description='bytes {начало}-{конец}/{размер файла}',
+				location='header',
+				required=False
+			)
+		],
+		responses={
+			200: UploadSessionSerializer,
+			409: ErrorDetailSerializer,
+			413: ErrorDetailSerializer
+		},
+	),
+	'finalize': extend_schema(
+		summary='Завершение загрузки и создание фотографии',
+		request=None,
+		responses={201: PhotoSerializer, 400: ErrorDetailSerializer},
+	),
+	'destroy': extend_schema(summary='Отмена загрузки'),
 }
+
+SIGNED_MEDIA = extend_schema(
+	summary='Получение файла по подписанной ссылке',
+	description='Ссылки с ограниченным сроком действия возвращаются в полях '
+							'photo и thumbnail фотографии. Авторизация не требуется, '
+							'ответ можно кешировать до истечения срока ссылки.',
+	parameters=[
+		OpenApiParameter(
+			name='expires', type=int, required=True,
+			description='Время окончания действия ссылки (unix time)'),
+		OpenApiParameter(
+			name='signature', type=str, required=True,
+			description='Подпись ссылки'),
+	],
+	responses={
+		(200, 'image/*'): OpenApiTypes.BINARY,
+		(206, 'image/*'): OpenApiTypes.BINARY,
+		304: None,
+		403: ErrorDetailSerializer,
+		404: None,
+		416: None
+	},
+)
@@ -0,0 +1,213 @@
+import datetime
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _normalize(field):
+    name = field.lstrip('-')
+    if name == 'id':
+        name = 'pk'
+    return f'-{name}' if field.startswith('-') else name
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on every ordering field plus the primary key,
+    so deep pages are fetched by a range condition instead of an OFFSET.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-pk',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        results = list(self.get_page_queryset(queryset, request))
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.fields = self.get_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = [_invert(f) for f in self.fields] if self.reverse \
+            else self.fields
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(
+                    ordering, self.position))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset[:self.page_size + 1]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        fields = [
+            _normalize(field) for field in queryset.query.order_by
+            if isinstance(field, str)
+        ] or list(self.ordering)
+        if 'pk' not in fields and '-pk' not in fields:
+            fields.append('-pk' if fields[-1].startswith('-') else 'pk')
+        return fields
+
+    def get_keyset_filter(self, ordering, position):
+        keyset = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': position[index]})
+            for previous, value in zip(ordering[:index], position):
+                condition &= Q(**{previous.lstrip('-'): value})
+            keyset |= condition
+        return keyset
+
+    def get_position(self, instance):
+        position = []
+        for field in self.fields:
+            name = field.lstrip('-')
+            if name == 'pk':
+                position.append(instance.pk)
+                continue
+            try:
+                name = self.model._meta.get_field(name).attname
+            except FieldDoesNotExist:
+                pass
+            position.append(getattr(instance, name))
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (BinasciiError, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [self.parse_value(field, value)
+                        for field, value in zip(self.fields, position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def parse_value(self, field, value):
+        # Cursors come from the client, so the values are checked against
+        # the ordering fields before they reach the query
+        if not isinstance(value, (int, float, str)):
+            raise TypeError(value)
+        name = field.lstrip('-')
+        try:
+            model_field = self.model._meta.pk if name == 'pk' \
+                else self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations, e.g. the search rank
+            return value
+        return model_field.to_python(value)
+
+    def encode_cursor(self, instance, reverse):
+        cursor = {'p': self.get_position(instance), 'r': int(reverse)}
+        encoded = b64encode(
+            json.dumps(cursor, default=_encode_value).encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {
+                    'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы (ссылки next/previous)',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Размер страницы (не более '
+                               f'{self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class PhotoPagination(KeysetPagination):
+    ordering = ('-uploaded_at', '-pk')
+
+
+class AlbumPagination(KeysetPagination):
+    ordering = ('-created_at', '-pk')
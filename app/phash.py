@@ -0,0 +1,62 @@
+from functools import lru_cache
+from itertools import combinations
+
+from PIL import Image
+
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# The hash is split into bands stored in indexed columns: two hashes
+# within distance d have at least one band within d // BANDS of each other,
+# so candidates are found by exact lookups of a few band values.
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+BAND_FIELDS = [f'hash_band_{index}' for index in range(BANDS)]
+
+
+def dhash(file):
+    """
+    Difference hash of an image: one bit per pair of horizontally adjacent
+    pixels of a grayscale 9x8 copy. Returned as a signed 64-bit integer,
+    so it fits a ``BigIntegerField``.
+    """
+    with Image.open(file) as image:
+        image = image.convert('L').resize(
+            (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+        pixels = list(image.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            index = row * (HASH_SIZE + 1) + column
+            value = value << 1 | (pixels[index] > pixels[index + 1])
+    return value - (1 << HASH_BITS) if value >> (HASH_BITS - 1) else value
+
+
+def get_bands(value):
+    return [(value >> (BAND_BITS * index)) & BAND_MASK
+            for index in range(BANDS)]
+
+
+def get_hash_fields(value):
+    bands = [None] * BANDS if value is None else get_bands(value)
+    return {'perceptual_hash': value, **dict(zip(BAND_FIELDS, bands))}
+
+
+def distance(first, second):
+    return ((first ^ second) & HASH_MASK).bit_count()
+
+
+@lru_cache
+def get_flip_masks(radius):
+    return [
+        sum(1 << bit for bit in bits)
+        for flipped in range(radius + 1)
+        for bits in combinations(range(BAND_BITS), flipped)
+    ]
+
+
+def get_neighbours(band, radius):
+    # All band values within ``radius`` bits of ``band``
+    return [band ^ mask for mask in get_flip_masks(radius)]
@@ -0,0 +1,68 @@
+import hashlib
+from typing import NamedTuple
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from app import imaging
+
+
+class Rendition(NamedTuple):
+    size: tuple
+    format: str
+    quality: int = 85
+
+    @property
+    def extension(self):
+        return 'jpg' if self.format == 'JPEG' else self.format.lower()
+
+    @property
+    def content_type(self):
+        return Image.MIME[self.format]
+
+
+RENDITIONS_DIR = 'renditions'
+
+RENDITIONS = {
+    'small': Rendition(size=(320, 320), format='JPEG'),
+    'medium': Rendition(size=(1024, 1024), format='JPEG'),
+    'large': Rendition(size=(2048, 2048), format='JPEG'),
+    'small_webp': Rendition(size=(320, 320), format='WEBP', quality=80),
+    'medium_webp': Rendition(size=(1024, 1024), format='WEBP', quality=80),
+    'large_webp': Rendition(size=(2048, 2048), format='WEBP', quality=80),
+}
+
+
+def get_rendition_path(photo, name):
+    return get_source_rendition_path(
+        get_source_key(photo.content_hash, photo.photo.name), name)
+
+
+def get_source_key(content_hash, photo_name):
+    return content_hash or hashlib.sha256(photo_name.encode()).hexdigest()
+
+
+def get_source_rendition_path(source_key, name):
+    # All renditions of one source share a directory, so they can be
+    # matched back to photos and removed together.
+    rendition = RENDITIONS[name]
+    key = f'{rendition.size}:{rendition.format}:{rendition.quality}'
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return f'{RENDITIONS_DIR}/{source_key[:2]}/{source_key}/' \
+           f'{digest}.{rendition.extension}'
+
+
+def render(source, rendition):
+    content, _ = imaging.resize(
+        source, rendition.size, rendition.format, rendition.quality)
+    return content
+
+
+def get_or_create_rendition(photo, name):
+    path = get_rendition_path(photo, name)
+    if default_storage.exists(path):
+        return path
+    with photo.photo.open('rb') as source:
+        content = render(source, RENDITIONS[name])
+    return default_storage.save(path, ContentFile(content))
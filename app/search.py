@@ -0,0 +1,76 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                           SearchVector)
+from django.db import connection
+from django.db.models import (Case, F, FloatField, IntegerField, Q, Value,
+                              When)
+from django.db.models.functions import Cast
+
+from app.caching import invalidate_user
+from app.models import Photo
+from config import settings
+
+
+def is_full_text_supported():
+    return connection.vendor == 'postgresql'
+
+
+def build_document(*parts):
+    return '\n'.join(part for part in parts if part).lower()
+
+
+def update_photo_documents(photo_ids):
+    photos = list(
+        Photo.objects.filter(pk__in=photo_ids)
+        .select_related('album')
+        .prefetch_related('tags')
+        .only('id', 'owner_id', 'title', 'album__title')
+    )
+    for photo in photos:
+        photo.search_document = build_document(
+            photo.title, photo.album.title,
+            *(tag.name for tag in photo.tags.all()))
+    Photo.objects.bulk_update(photos, ['search_document'], batch_size=500)
+    if is_full_text_supported():
+        Photo.objects.filter(pk__in=photo_ids).update(
+            search_vector=SearchVector(
+                'search_document', config=settings.SEARCH_CONFIG))
+    # Searches answered before the update were cached with the old text
+    for owner_id in {photo.owner_id for photo in photos}:
+        invalidate_user(owner_id)
+
+
+def update_album_documents(album_id):
+    update_photo_documents(list(
+        Photo.objects.filter(album_id=album_id).values_list('id', flat=True)
+    ))
+
+
+def search(queryset, text, document_field, vector_field=None):
+    """
+    Filter ``queryset`` by ``text`` and annotate it with ``rank``.
+
+    PostgreSQL uses full-text search over ``vector_field`` (or a vector
+    built from ``document_field`` on the fly); other databases fall back
+    to matching every word in ``document_field`` and rank by the number of
+    words found in the title.
+    """
+    if is_full_text_supported():
+        query = SearchQuery(
+            text, config=settings.SEARCH_CONFIG, search_type='websearch')
+        if vector_field:
+            vector = F(vector_field)
+        else:
+            vector = SearchVector(
+                document_field, config=settings.SEARCH_CONFIG)
+        return queryset.alias(search=vector)\
+            .filter(search=query)\
+            .annotate(rank=Cast(SearchRank(vector, query), FloatField()))
+    terms = text.lower().split()
+    condition = Q()
+    for term in terms:
+        condition &= Q(**{f'{document_field}__contains': term})
+    rank = sum(
+        (Case(When(title__icontains=term, then=Value(1)), default=Value(0),
+              output_field=IntegerField()) for term in terms),
+        Value(0))
+    return queryset.filter(condition).annotate(rank=rank)
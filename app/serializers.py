@@ -1,14 +1,47 @@
+from typing import Dict, Optional
+
 from drf_spectacular.extensions import OpenApiSerializerFieldExtension
 from drf_spectacular.plumbing import build_array_type
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.reverse import reverse
 from taggit.serializers import (TagListSerializerField,
                                 TaggitSerializer)
-from app.models import Photo, Album
+from app import media
+from app.exceptions import UploadSizeError
+from app.models import Photo, Album, UploadSession
+from app.pagination import PhotoPagination
+from app.renditions import RENDITIONS
+from app.validators import validate_image
+from config import settings
+
+
+def get_media_url(view_name, pk, name, request):
+    # A signed, expiring URL or, when those are disabled, the endpoint
+    # that checks ownership; ``v`` changes whenever the file does.
+    if settings.MEDIA_SIGNED_URLS:
+        return media.get_signed_url(name, request)
+    url = reverse(view_name, kwargs={'pk': pk}, request=request)
+    return f'{url}?v={media.get_version(name)}'
+
+
+class ProtectedFileField(serializers.FileField):
+    def __init__(self, view_name, **kwargs):
+        self.view_name = view_name
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        if not value:
+            return None
+        return get_media_url(self.view_name, value.instance.pk, value.name,
+                             self.context.get('request'))
 
 
 class PhotoSerializer(TaggitSerializer, serializers.ModelSerializer):
-    photo = serializers.FileField()
-    thumbnail = serializers.FileField(read_only=True)
+    photo = ProtectedFileField('photos-original', validators=[validate_image])
+    thumbnail = ProtectedFileField('photos-thumbnail', read_only=True)
+    renditions = serializers.SerializerMethodField()
     album = serializers.PrimaryKeyRelatedField(queryset=Album.objects.all())
     album_title = serializers.CharField(source='album.title', read_only=True)
     owner = serializers.StringRelatedField(read_only=True)
@@ -18,34 +51,210 @@ class PhotoSerializer(TaggitSerializer, serializers.ModelSerializer):
     uploaded_at = serializers.DateTimeField(
         read_only=True, format='%Y-%m-%d %H:%M:%S'
     )
+    taken_at = serializers.DateTimeField(
+        read_only=True, format='%Y-%m-%d %H:%M:%S'
+    )
+    captured_at = serializers.DateTimeField(
+        read_only=True, format='%Y-%m-%d %H:%M:%S'
+    )
     
     class Meta:
         model = Photo
         fields = [
-            'id', 'title', 'photo', 'thumbnail', 'album', 'album_title',
-            'owner', 'tags', 'uploaded_at'
+            'id', 'title', 'photo', 'content_hash', 'thumbnail',
+            'thumbnail_status', 'renditions', 'album', 'album_title', 'owner',
+            'tags', 'uploaded_at', 'taken_at', 'captured_at', 'width',
+            'height', 'camera_make', 'camera_model', 'latitude', 'longitude'
         ]
+        read_only_fields = [
+            'content_hash', 'thumbnail_status', 'width', 'height',
+            'camera_make', 'camera_model', 'latitude', 'longitude'
+        ]
+    
+    def validate_album(self, album):
+        if album.owner_id != self.context['request'].user.id:
+            raise NotFound({'detail': 'album not found'})
+        return album
+    
+    def get_renditions(self, obj) -> Dict[str, str]:
+        request = self.context.get('request')
+        version = media.get_version(obj.photo.name)
+        return {
+            name: reverse(
+                'photos-rendition',
+                kwargs={'pk': obj.pk, 'name': name},
+                request=request) + f'?v={version}'
+            for name in RENDITIONS
+        }
+
+
+class PaginatedPhotoSerializer(serializers.Serializer):
+    next = serializers.URLField(allow_null=True)
+    previous = serializers.URLField(allow_null=True)
+    results = PhotoSerializer(many=True)
+
+
+class AlbumPreviewSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    thumbnail = serializers.SerializerMethodField()
+    
+    def get_thumbnail(self, obj) -> Optional[str]:
+        if not obj['thumbnail']:
+            return None
+        return get_media_url('photos-thumbnail', obj['id'], obj['thumbnail'],
+                             self.context.get('request'))
 
 
 class AlbumSerializer(serializers.ModelSerializer):
-    photos = PhotoSerializer(many=True, read_only=True)
+    photos = serializers.SerializerMethodField()
     owner = serializers.StringRelatedField(read_only=True)
     created_at = serializers.DateTimeField(
         read_only=True, format='%Y-%m-%d %H:%M:%S'
     )
+    photos_amount = serializers.IntegerField(
+        source='photos_count', read_only=True
+    )
+    last_uploaded_at = serializers.DateTimeField(
+        read_only=True, format='%Y-%m-%d %H:%M:%S'
+    )
+    cover = serializers.SerializerMethodField()
+    preview = AlbumPreviewSerializer(many=True, read_only=True)
     
     class Meta:
         model = Album
         fields = [
-            'id', 'title', 'owner', 'created_at', 'photos_amount', 'photos'
+            'id', 'title', 'owner', 'created_at', 'photos_amount',
+            'last_uploaded_at', 'cover', 'preview', 'photos'
         ]
         read_only_fields = ['owner', 'created_at']
     
+    @extend_schema_field(AlbumPreviewSerializer(allow_null=True))
+    def get_cover(self, obj):
+        if not obj.preview:
+            return None
+        return AlbumPreviewSerializer(obj.preview[0], context=self.context)\
+            .data
+    
+    @extend_schema_field(PaginatedPhotoSerializer)
+    def get_photos(self, obj):
+        paginator = PhotoPagination()
+        photos = obj.photos.select_related('owner').prefetch_related('tags')
+        page = paginator.paginate_queryset(photos, self.context['request'])
+        serializer = PhotoSerializer(page, many=True, context=self.context)
+        return paginator.get_paginated_response(serializer.data).data
+    
     
 class AlbumListSerializer(AlbumSerializer):
     class Meta:
         model = Album
-        fields = ['id', 'title', 'owner', 'created_at', 'photos_amount']
+        fields = [
+            'id', 'title', 'owner', 'created_at', 'photos_amount',
+            'last_uploaded_at', 'cover', 'preview'
+        ]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    album = serializers.PrimaryKeyRelatedField(queryset=Album.objects.all())
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=100), required=False,
+        help_text='["tag1", "tag2", ...]'
+    )
+    size = serializers.IntegerField(
+        min_value=1, help_text='Полный размер файла в байтах')
+    created_at = serializers.DateTimeField(
+        read_only=True, format='%Y-%m-%d %H:%M:%S'
+    )
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'album', 'title', 'tags', 'filename', 'size', 'offset',
+            'created_at'
+        ]
+        read_only_fields = ['offset']
+    
+    def validate_album(self, album):
+        if album.owner_id != self.context['request'].user.id:
+            raise NotFound({'detail': 'album not found'})
+        return album
+    
+    def validate_size(self, size):
+        if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise UploadSizeError
+        return size
+
+
+class PhotoBulkCreateSerializer(serializers.Serializer):
+    album = serializers.PrimaryKeyRelatedField(queryset=Album.objects.all())
+    photos = serializers.ListField(
+        child=serializers.FileField(allow_empty_file=True),
+        allow_empty=False,
+        max_length=settings.MAX_BULK_UPLOAD_FILES
+    )
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=100), required=False,
+        help_text='Теги для всех загружаемых фото'
+    )
+    
+    def validate_album(self, album):
+        if album.owner_id != self.context['request'].user.id:
+            raise NotFound({'detail': 'album not found'})
+        return album
+
+
+class PhotoMoveSerializer(serializers.Serializer):
+    album = serializers.PrimaryKeyRelatedField(queryset=Album.objects.all())
+    photos = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.MAX_BULK_MOVE_PHOTOS
+    )
+    
+    def validate_album(self, album):
+        if album.owner_id != self.context['request'].user.id:
+            raise NotFound({'detail': 'album not found'})
+        return album
+
+
+class PhotoMoveResultSerializer(serializers.Serializer):
+    album = serializers.IntegerField()
+    moved = serializers.IntegerField()
+    not_found = serializers.ListField(child=serializers.IntegerField())
+
+
+class SimilarPhotoSerializer(PhotoSerializer):
+    distance = serializers.IntegerField(
+        read_only=True, help_text='Число различающихся бит хеша')
+    
+    class Meta(PhotoSerializer.Meta):
+        fields = [*PhotoSerializer.Meta.fields, 'distance']
+
+
+class SimilarityQuerySerializer(serializers.Serializer):
+    distance = serializers.IntegerField(
+        min_value=0, max_value=settings.MAX_SIMILAR_PHOTOS_DISTANCE,
+        required=False)
+
+
+class DuplicateGroupSerializer(serializers.Serializer):
+    photos = serializers.ListField(child=serializers.IntegerField())
+
+
+class PhotoBulkUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField(max_length=255, required=False)
+    album = serializers.IntegerField(required=False)
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=100), required=False
+    )
+
+
+class PhotoBulkResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField(required=False)
+    filename = serializers.CharField(required=False)
+    id = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(['created', 'updated', 'error'])
+    errors = serializers.JSONField(required=False)
 
 
 class PhotoUpdateSchemaSerializer(serializers.Serializer):
@@ -0,0 +1,51 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from taggit.models import TaggedItem
+
+from app import deletion, search, tasks
+from app.caching import invalidate_user
+from app.models import Album, Photo
+
+
+@receiver(post_save, sender=Album)
+@receiver(post_delete, sender=Album)
+@receiver(post_save, sender=Photo)
+def invalidate_owner_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_user(instance.owner_id)
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def invalidate_tagged_photo_cache(sender, instance, action, **kwargs):
+    if isinstance(instance, Photo) and action.startswith('post_'):
+        invalidate_user(instance.owner_id)
+        tasks.enqueue(search.update_photo_documents, [instance.pk])
+
+
+@receiver(post_save, sender=Photo)
+def update_photo_search_document(sender, instance, raw=False,
+                                 update_fields=None, **kwargs):
+    if raw or (update_fields and 'title' not in update_fields
+               and 'album' not in update_fields):
+        return
+    tasks.enqueue(search.update_photo_documents, [instance.pk])
+
+
+@receiver(post_save, sender=Photo)
+def add_photo_to_album(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Album.change_photos_count({instance.album_id: 1})
+        tasks.enqueue(tasks.refresh_albums, [instance.album_id])
+
+
+@receiver(post_delete, sender=Photo)
+def release_photo_content(sender, instance, **kwargs):
+    deletion.photo_deleted(instance)
+
+
+@receiver(post_save, sender=Album)
+def update_album_search_documents(sender, instance, created, raw=False,
+                                  update_fields=None, **kwargs):
+    if raw or created or (update_fields and 'title' not in update_fields):
+        return
+    tasks.enqueue(search.update_album_documents, instance.pk)
@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from django.db.models import Q
+
+from app import phash
+from app.models import Photo
+
+
+def find_similar(photo, max_distance, limit):
+    """
+    Ids of the owner's photos whose perceptual hash is within
+    ``max_distance`` bits of ``photo``, mapped to the distance and
+    ordered from the closest.
+    """
+    if photo.perceptual_hash is None:
+        return {}
+    radius = max_distance // phash.BANDS
+    condition = Q()
+    for field, band in zip(phash.BAND_FIELDS,
+                           phash.get_bands(photo.perceptual_hash)):
+        condition |= Q(**{f'{field}__in': phash.get_neighbours(band, radius)})
+    candidates = Photo.objects\
+        .filter(condition, owner_id=photo.owner_id)\
+        .exclude(pk=photo.pk)\
+        .values_list('pk', 'perceptual_hash')
+    distances = {}
+    for pk, value in candidates:
+        distance = phash.distance(photo.perceptual_hash, value)
+        if distance <= max_distance:
+            distances[pk] = distance
+    closest = sorted(distances, key=lambda pk: (distances[pk], pk))[:limit]
+    return {pk: distances[pk] for pk in closest}
+
+
+def find_duplicates(owner_id, max_distance):
+    """
+    Group the owner's photos whose perceptual hashes are within
+    ``max_distance`` bits of each other, directly or through other photos
+    of the group. Groups are lists of photo ids, the largest first.
+    """
+    photo_ids = defaultdict(list)
+    for pk, value in Photo.objects\
+            .filter(owner_id=owner_id, perceptual_hash__isnull=False)\
+            .order_by('pk')\
+            .values_list('pk', 'perceptual_hash')\
+            .iterator():
+        photo_ids[value].append(pk)
+    # Identical hashes are grouped as is, only distinct ones are compared
+    values = list(photo_ids)
+    buckets = [defaultdict(list) for _ in range(phash.BANDS)]
+    for index, value in enumerate(values):
+        for bucket, band in zip(buckets, phash.get_bands(value)):
+            bucket[band].append(index)
+    parents = list(range(len(values)))
+
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    radius = max_distance // phash.BANDS
+    for index, value in enumerate(values):
+        for bucket, band in zip(buckets, phash.get_bands(value)):
+            for neighbour in phash.get_neighbours(band, radius):
+                for other in bucket.get(neighbour, ()):
+                    if other > index and \
+                            phash.distance(value, values[other]) <= \
+                            max_distance:
+                        parents[find(other)] = find(index)
+    groups = defaultdict(list)
+    for index, value in enumerate(values):
+        groups[find(index)].extend(photo_ids[value])
+    return sorted(
+        (sorted(group) for group in groups.values() if len(group) > 1),
+        key=lambda group: (-len(group), group[0]))
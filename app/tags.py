@@ -0,0 +1,29 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
+from taggit.models import TaggedItem
+
+
+def tagged_object_ids(model, names):
+    return TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        tag__name__in=names
+    ).values('object_id')
+
+
+def with_any_tags(queryset, names):
+    return queryset.filter(
+        pk__in=tagged_object_ids(queryset.model, names))
+
+
+def with_all_tags(queryset, names):
+    names = set(names)
+    object_ids = tagged_object_ids(queryset.model, names)\
+        .annotate(matched=Count('tag_id', distinct=True))\
+        .filter(matched=len(names))\
+        .values('object_id')
+    return queryset.filter(pk__in=object_ids)
+
+
+def without_tags(queryset, names):
+    return queryset.exclude(
+        pk__in=tagged_object_ids(queryset.model, names))
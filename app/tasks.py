@@ -0,0 +1,226 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from app import imaging, phash
+from app.blobs import (BLOBS_DIR, THUMBNAILS_DIR, get_content_hash,
+                       get_content_path, lock_content, save_content)
+from app.caching import invalidate_user
+from app.models import Album, Photo
+from app.renditions import (RENDITIONS, get_source_key,
+                            get_source_rendition_path)
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RELEASE_BATCH_SIZE = 500
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='background-task')
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        connections.close_all()
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Run ``func`` in the in-process worker pool once the current transaction
+    commits, or immediately when ``BACKGROUND_TASKS_EAGER`` is set.
+    """
+    if settings.BACKGROUND_TASKS_EAGER:
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_run, func, args, kwargs))
+
+
+def generate_thumbnail(photo_id):
+    photo = Photo.objects.select_related('owner', 'album')\
+        .filter(pk=photo_id).first()
+    if photo is None:
+        return
+    if photo.content_hash:
+        found = Photo.find_thumbnail(photo.content_hash)
+        if found:
+            thumbnail, perceptual_hash = found
+            Photo.objects.filter(pk=photo_id).update(
+                thumbnail=thumbnail,
+                thumbnail_status=Photo.ThumbnailStatus.READY,
+                **phash.get_hash_fields(perceptual_hash))
+            invalidate_user(photo.owner_id)
+            refresh_preview(photo)
+            return
+    try:
+        with photo.photo.open('rb'):
+            if not photo.content_hash:
+                photo.content_hash = get_content_hash(photo.photo)
+            # A thumbnail of the same content may be stored without any
+            # photo referencing it yet, e.g. by a concurrent import
+            thumbnail = get_content_path(
+                THUMBNAILS_DIR, photo.content_hash, photo.photo.name)
+            if default_storage.exists(thumbnail):
+                with default_storage.open(thumbnail, 'rb') as stored:
+                    content = stored.read()
+            else:
+                content, _ = imaging.resize(
+                    photo.photo, imaging.THUMBNAIL_SIZE, sharpen=True)
+                save_content(thumbnail, content)
+            perceptual_hash = phash.dhash(BytesIO(content))
+    except Exception:
+        Photo.objects.filter(pk=photo_id).update(
+            thumbnail_status=Photo.ThumbnailStatus.FAILED)
+        invalidate_user(photo.owner_id)
+        raise
+    Photo.objects.filter(pk=photo_id).update(
+        content_hash=photo.content_hash,
+        thumbnail=thumbnail,
+        thumbnail_status=Photo.ThumbnailStatus.READY,
+        **phash.get_hash_fields(perceptual_hash))
+    invalidate_user(photo.owner_id)
+    refresh_preview(photo)
+
+
+def refresh_preview(photo):
+    # The album preview lists pending photos without a thumbnail. The
+    # stored preview may not include the photo yet, as the refresh queued
+    # with the upload can still be running, so the photo's position is
+    # checked instead.
+    newest = Photo.objects\
+        .filter(album_id=photo.album_id)\
+        .order_by('-uploaded_at', '-pk')\
+        .values_list('pk', flat=True)[:settings.ALBUM_PREVIEW_SIZE]
+    if photo.pk in newest:
+        refresh_albums([photo.album_id])
+
+
+def refresh_albums(album_ids):
+    """
+    Recompute the stored last upload time and preview of the albums whose
+    photos were added, removed or moved. Photo counters are kept by
+    ``Album.change_photos_count`` instead.
+    """
+    # Concurrent refreshes of an album run one after another, so the last
+    # one to write has read the latest photos. Only the row locks need a
+    # transaction, a savepoint inside the caller's one is not needed.
+    with transaction.atomic(savepoint=False):
+        albums = {
+            album.pk: album for album in Album.objects
+            .select_for_update()
+            .filter(pk__in=set(album_ids))
+            .order_by('pk')
+        }
+        if not albums:
+            return
+        for album in albums.values():
+            # The newest photo comes first, so it also gives the upload
+            # time
+            photos = list(Photo.objects
+                          .filter(album_id=album.pk)
+                          .order_by('-uploaded_at', '-pk')
+                          .values_list('pk', 'thumbnail', 'uploaded_at')
+                          [:settings.ALBUM_PREVIEW_SIZE])
+            album.preview = [
+                {'id': pk, 'thumbnail': thumbnail}
+                for pk, thumbnail, _ in photos
+            ]
+            album.last_uploaded_at = photos[0][2] if photos else None
+        Album.objects.bulk_update(
+            albums.values(), ['last_uploaded_at', 'preview'])
+    for owner_id in {album.owner_id for album in albums.values()}:
+        invalidate_user(owner_id)
+
+
+def relocate_legacy_files(photo_ids):
+    """
+    Move originals and thumbnails stored under the old per-album layout
+    to content-addressed paths, so they no longer depend on the album.
+    """
+    photos = Photo.objects.filter(pk__in=photo_ids)\
+        .exclude(photo__startswith=f'{BLOBS_DIR}/')\
+        .exclude(photo='')
+    released, album_ids = [], set()
+    for photo in photos:
+        old_photo, old_thumbnail = photo.photo.name, photo.thumbnail.name
+        with photo.photo.open('rb'):
+            photo.content_hash = photo.content_hash or \
+                get_content_hash(photo.photo)
+            name = photo.photo.field.generate_filename(photo, old_photo)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, photo.photo)
+        thumbnail, _ = Photo.find_thumbnail(photo.content_hash) or ('', None)
+        if not thumbnail.startswith(f'{THUMBNAILS_DIR}/') and old_thumbnail:
+            thumbnail = photo.thumbnail.field.generate_filename(
+                photo, os.path.basename(name))
+            if not default_storage.exists(thumbnail):
+                with photo.thumbnail.open('rb'):
+                    thumbnail = default_storage.save(
+                        thumbnail, photo.thumbnail)
+        fields = {'photo': name, 'content_hash': photo.content_hash}
+        if thumbnail:
+            fields.update(thumbnail=thumbnail,
+                          thumbnail_status=Photo.ThumbnailStatus.READY)
+        if Photo.objects.filter(pk=photo.pk, photo=old_photo)\
+                .update(**fields):
+            released.append(('', old_photo, old_thumbnail))
+            album_ids.add(photo.album_id)
+            invalidate_user(photo.owner_id)
+    if released:
+        # Previews must stop pointing at the old thumbnails before they
+        # are deleted
+        refresh_albums(album_ids)
+        release_files(released)
+
+
+def release_files(files):
+    """
+    Delete the stored files of deleted photos unless a remaining photo
+    still references the same content. ``files`` is a list of
+    ``(content_hash, photo_name, thumbnail_name)`` tuples.
+    """
+    hashes = list({content_hash for content_hash, *_ in files if content_hash})
+    referenced = set()
+    for index in range(0, len(hashes), RELEASE_BATCH_SIZE):
+        referenced.update(Photo.objects
+                          .filter(content_hash__in=hashes[
+                              index:index + RELEASE_BATCH_SIZE])
+                          .values_list('content_hash', flat=True)
+                          .distinct())
+    released = {}
+    for content_hash, photo_name, thumbnail_name in files:
+        if content_hash in referenced:
+            continue
+        source_key = get_source_key(content_hash, photo_name)
+        released.setdefault(content_hash, set()).update([
+            photo_name, thumbnail_name, *(
+                get_source_rendition_path(source_key, name)
+                for name in RENDITIONS)])
+    for content_hash, names in released.items():
+        with transaction.atomic():
+            # A photo of the same content saved since the check restores
+            # the files under the same lock once committed, so it is either
+            # found here or finds the files deleted
+            if content_hash:
+                lock_content(content_hash)
+                if Photo.objects.filter(content_hash=content_hash).exists():
+                    continue
+            for name in names:
+                if name:
+                    default_storage.delete(name)
@@ -0,0 +1,150 @@
+import fcntl
+import os
+import re
+import uuid
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+
+from app.exceptions import UploadOffsetError, UploadSizeError
+from app.models import Photo, UploadSession
+from app.validators import validate_image
+from config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def parse_content_range(header, session):
+    if not header:
+        return session.offset, None
+    match = CONTENT_RANGE_RE.match(header.strip())
+    if not match:
+        raise ValidationError({'detail': 'invalid Content-Range header'})
+    start, end, total = map(int, match.groups())
+    if end < start or total != session.size:
+        raise ValidationError({'detail': 'invalid Content-Range header'})
+    return start, end - start + 1
+
+
+def write_chunk(session, stream, start, length=None):
+    """
+    Write a chunk to the part file and advance the session offset. The body
+    is streamed without holding a transaction: a lock on the part file keeps
+    concurrent requests for the session apart, and the offset is only
+    advanced if it has not moved since the chunk started.
+    """
+    os.makedirs(os.path.dirname(session.part_path), exist_ok=True)
+    descriptor = os.open(session.part_path, os.O_RDWR | os.O_CREAT, 0o600)
+    with open(descriptor, 'r+b') as part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise_offset_error(session)
+        session.refresh_from_db(fields=['offset'])
+        if start != session.offset:
+            raise_offset_error(session)
+        written = 0
+        part.seek(start)
+        part.truncate()
+        while stream is not None:
+            data = stream.read(CHUNK_SIZE)
+            if not data:
+                break
+            written += len(data)
+            if start + written > session.size:
+                part.truncate(start)
+                raise UploadSizeError
+            part.write(data)
+        if length is not None and written != length:
+            part.truncate(start)
+            raise ValidationError(
+                {'detail': 'chunk size does not match Content-Range'})
+        part.flush()
+        if not UploadSession.objects\
+                .filter(pk=session.pk, offset=start)\
+                .update(offset=start + written):
+            raise_offset_error(session)
+    session.offset = start + written
+    return session
+
+
+def raise_offset_error(session):
+    offset = UploadSession.objects\
+        .filter(pk=session.pk)\
+        .values_list('offset', flat=True)\
+        .first()
+    if offset is None:
+        raise NotFound
+    raise UploadOffsetError({
+        'detail': 'Chunk does not start at the current upload offset',
+        'offset': offset
+    })
+
+
+def finalize(session):
+    if session.offset != session.size:
+        raise ValidationError({
+            'detail': 'upload is not complete', 'offset': session.offset})
+    part_path = session.part_path
+    with open(part_path, 'rb') as part:
+        file = File(part, name=session.filename)
+        try:
+            validate_image(file)
+        except ValidationError as e:
+            # The upload is complete, so resending chunks won't help
+            session.delete()
+            discard(part_path)
+            raise ValidationError({'photo': e.detail})
+        with transaction.atomic():
+            photo = Photo(
+                owner=session.owner, album=session.album,
+                title=session.title)
+            photo.photo = file
+            photo.save()
+            if session.tags:
+                photo.tags.set(session.tags)
+            session.delete()
+    discard(part_path)
+    return photo
+
+
+def discard(part_path):
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+
+def expire_sessions():
+    """
+    Delete the sessions started more than ``CHUNKED_UPLOAD_TTL`` seconds
+    ago with their part files, and old part files left without a session,
+    e.g. when the album was deleted during the upload.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_TTL)
+    expired = UploadSession.objects.filter(created_at__lt=cutoff)
+    part_paths = [session.part_path for session in expired.only('id')]
+    expired.delete()
+    for part_path in part_paths:
+        discard(part_path)
+    if not os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+        return
+    stale = {}
+    with os.scandir(settings.CHUNKED_UPLOAD_DIR) as entries:
+        for entry in entries:
+            stem, extension = os.path.splitext(entry.name)
+            if extension != '.part' or \
+                    entry.stat().st_mtime >= cutoff.timestamp():
+                continue
+            try:
+                stale[uuid.UUID(stem)] = entry.path
+            except ValueError:
+                continue
+    active = UploadSession.objects\
+        .filter(pk__in=stale)\
+        .values_list('pk', flat=True)
+    for pk in set(stale) - set(active):
+        discard(stale[pk])
@@ -0,0 +1,30 @@
+import warnings
+
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from config import settings
+
+
+def validate_image(file):
+    """
+    Check the format and dimensions of an uploaded image. Only the file
+    header is parsed, so oversized images and decompression bombs are
+    rejected before any pixel data is decoded.
+    """
+    try:
+        file.seek(0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(file) as image:
+                format, (width, height) = image.format, image.size
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        raise ValidationError('image dimensions exceed the allowed maximum')
+    except (OSError, SyntaxError, ValueError):
+        raise ValidationError('file is not a valid image')
+    finally:
+        file.seek(0)
+    if format not in settings.ALLOWED_IMAGE_FORMATS:
+        raise ValidationError(f'image format {format} is not supported')
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise ValidationError('image dimensions exceed the allowed maximum')
@@ -1,17 +1,23 @@
-from django.db.models import Count
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, extend_schema_view
-from rest_framework import viewsets, parsers
-from rest_framework.exceptions import NotFound
+from rest_framework import mixins, parsers, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from app import serializers, openapi_schemas
-from app.filters import PhotoFilter
-from app.models import Album, Photo
+from app import (archive, bulk, deletion, media, serializers,
+                 openapi_schemas, renditions, similarity, tasks, uploads)
+from app.caching import ConditionalResponseMixin
+from app.filters import FullTextSearchFilter, PhotoFilter
+from app.pagination import AlbumPagination, PhotoPagination
+from app.models import Album, Photo, UploadSession
 from app.permissions import IsOwner
+from config import settings
 
 
-class OwnerOnlyViewSet(viewsets.ModelViewSet):
+class OwnerOnlyViewSet(ConditionalResponseMixin, viewsets.ModelViewSet):
     permission_classes = [IsOwner]
     http_method_names = ['get', 'post', 'patch', 'delete']
     
@@ -25,31 +31,217 @@ class OwnerOnlyViewSet(viewsets.ModelViewSet):
 @extend_schema(tags=['albums'])
 @extend_schema_view(**openapi_schemas.ALBUM_VIEWSET)
 class AlbumViewSet(OwnerOnlyViewSet):
-    queryset = Album.objects\
-        .select_related('owner')\
-        .prefetch_related('photos', 'photos__tags')\
-        .annotate(photos_count=Count('photos'))
-    filter_backends = [OrderingFilter]
+    queryset = Album.objects.select_related('owner')
+    filter_backends = [FullTextSearchFilter, OrderingFilter]
+    search_document_field = 'title'
     ordering_fields = ['created_at', 'photos_count']
+    pagination_class = AlbumPagination
     
     def get_serializer_class(self):
         if self.action in ['list', 'partial_update']:
             return serializers.AlbumListSerializer
         return serializers.AlbumSerializer
+    
+    def perform_destroy(self, instance):
+        with deletion.deferred_cleanup():
+            instance.delete()
+    
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'download':
+            force = True
+        return super().perform_content_negotiation(request, force)
+    
+    @action(detail=True)
+    def download(self, request, pk=None):
+        album = self.get_object()
+        photos = album.photos\
+            .only('id', 'title', 'photo', 'content_hash', 'uploaded_at')\
+            .order_by('uploaded_at', 'id')
+        return archive.serve(
+            request, f'{album.title}.zip', archive.get_entries(photos))
 
 
 @extend_schema_view(**openapi_schemas.PHOTO_VIEWSET)
 @extend_schema(tags=['photos'])
 class PhotoViewSet(OwnerOnlyViewSet):
-    queryset = Photo.objects.prefetch_related('tags')
+    queryset = Photo.objects\
+        .select_related('album', 'owner')\
+        .prefetch_related('tags')
     parser_classes = [parsers.MultiPartParser, parsers.JSONParser]
     serializer_class = serializers.PhotoSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [
+        DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_class = PhotoFilter
-    ordering_fields = ['uploaded_at', 'album']
+    search_document_field = 'search_document'
+    search_vector_field = 'search_vector'
+    ordering_fields = ['uploaded_at', 'captured_at', 'album']
+    pagination_class = PhotoPagination
     
     def create(self, request, *args, **kwargs):
-        album = Album.objects.filter(pk=request.data['album'])
-        if not album or album.first().owner != request.user:
+        album_id = str(request.data.get('album', ''))
+        if not album_id.isdecimal() or not Album.objects\
+                .filter(pk=album_id, owner=request.user).exists():
             raise NotFound({'detail': 'album not found'})
         return super().create(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        serializer = serializers.PhotoBulkCreateSerializer(
+            data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        results = bulk.create_photos(
+            request.user,
+            serializer.validated_data['album'],
+            request.FILES.getlist('photos'),
+            serializer.validated_data.get('tags', []))
+        return Response(results, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def move(self, request):
+        serializer = serializers.PhotoMoveSerializer(
+            data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        result = bulk.move_photos(
+            request.user,
+            serializer.validated_data['album'],
+            serializer.validated_data['photos'])
+        return Response(result)
+    
+    def perform_update(self, serializer):
+        album_id = serializer.instance.album_id
+        photo = serializer.save()
+        if photo.album_id != album_id:
+            Album.change_photos_count({album_id: -1, photo.album_id: 1})
+            tasks.enqueue(tasks.relocate_legacy_files, [photo.pk])
+            tasks.enqueue(tasks.refresh_albums, [album_id, photo.album_id])
+    
+    @openapi_schemas.PHOTO_BULK_UPDATE
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        serializer = serializers.PhotoBulkUpdateItemSerializer(
+            data=request.data, many=True,
+            max_length=settings.MAX_BULK_UPDATE_PHOTOS)
+        serializer.is_valid(raise_exception=True)
+        results = bulk.update_photos(request.user, serializer.validated_data)
+        return Response(results)
+
+    def perform_content_negotiation(self, request, force=False):
+        if self.action in ['original', 'thumbnail', 'rendition']:
+            force = True
+        return super().perform_content_negotiation(request, force)
+    
+    @action(detail=True)
+    def original(self, request, pk=None):
+        photo = self.get_object()
+        return media.serve(request, photo.photo.name)
+    
+    @action(detail=True)
+    def thumbnail(self, request, pk=None):
+        photo = self.get_object()
+        if not photo.thumbnail:
+            raise NotFound({'detail': 'thumbnail not found'})
+        return media.serve(request, photo.thumbnail.name)
+
+    @action(detail=True, url_path=r'renditions/(?P<name>[\w-]+)')
+    def rendition(self, request, pk=None, name=None):
+        if name not in renditions.RENDITIONS:
+            raise NotFound({'detail': 'rendition not found'})
+        photo = self.get_object()
+        path = renditions.get_or_create_rendition(photo, name)
+        return media.serve(
+            request, path, renditions.RENDITIONS[name].content_type)
+
+    
+    @action(detail=True, filter_backends=[], pagination_class=None)
+    def similar(self, request, pk=None):
+        return self.cached_response(self.get_similar, request, pk=pk)
+    
+    def get_similar(self, request, pk=None):
+        photo = self.get_object()
+        query = serializers.SimilarityQuerySerializer(
+            data=request.query_params)
+        query.is_valid(raise_exception=True)
+        distances = similarity.find_similar(
+            photo,
+            query.validated_data.get(
+                'distance', settings.SIMILAR_PHOTOS_DISTANCE),
+            settings.MAX_SIMILAR_PHOTOS)
+        photos = self.get_queryset().in_bulk(distances)
+        for pk, distance in distances.items():
+            photos[pk].distance = distance
+        serializer = serializers.SimilarPhotoSerializer(
+            [photos[pk] for pk in distances if pk in photos], many=True,
+            context=self.get_serializer_context())
+        return Response(serializer.data)
+    
+    @action(detail=False, filter_backends=[], pagination_class=None)
+    def duplicates(self, request):
+        return self.cached_response(self.get_duplicates, request)
+    
+    def get_duplicates(self, request):
+        query = serializers.SimilarityQuerySerializer(
+            data=request.query_params)
+        query.is_valid(raise_exception=True)
+        groups = similarity.find_duplicates(
+            request.user.pk,
+            query.validated_data.get(
+                'distance', settings.DUPLICATE_PHOTOS_DISTANCE))
+        return Response([{'photos': group} for group in groups])
+
+@extend_schema(tags=['uploads'])
+@extend_schema_view(**openapi_schemas.UPLOAD_VIEWSET)
+class UploadSessionViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    queryset = UploadSession.objects.all()
+    serializer_class = serializers.UploadSessionSerializer
+    permission_classes = [IsOwner]
+    http_method_names = ['get', 'post', 'put', 'delete']
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(owner=self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+        tasks.enqueue(uploads.expire_sessions)
+    
+    def update(self, request, *args, **kwargs):
+        session = self.get_object()
+        start, length = uploads.parse_content_range(
+            request.headers.get('Content-Range'), session)
+        uploads.write_chunk(session, request.stream, start, length)
+        return Response(self.get_serializer(session).data)
+    
+    def perform_destroy(self, instance):
+        part_path = instance.part_path
+        instance.delete()
+        uploads.discard(part_path)
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        photo = uploads.finalize(self.get_object())
+        serializer = serializers.PhotoSerializer(
+            photo, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=['media'])
+class SignedMediaView(APIView):
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+    
+    @openapi_schemas.SIGNED_MEDIA
+    def get(self, request, name):
+        remaining = media.check_signature(
+            name, request.query_params.get('expires'),
+            request.query_params.get('signature'))
+        if remaining is None:
+            raise PermissionDenied({'detail': 'invalid or expired signature'})
+        max_age = min(remaining, settings.MEDIA_CACHE_MAX_AGE)
+        return media.serve(
+            request, name,
+            cache_control=f'public, max-age={max_age}, immutable')
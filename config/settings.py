@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -73,6 +74,15 @@ DATABASES = {
     }
 }
 
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 390000))
+PASSWORD_HASHERS = os.environ.get(
+    'PASSWORD_HASHERS',
+    'users.hashers.PBKDF2PasswordHasher,'
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher,'
+    'django.contrib.auth.hashers.ScryptPasswordHasher'
+).split(',')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,22 +114,84 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'admin@localhost'
 EMAIL_HOST_USER = 'admin@localhost'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Local-memory caches are separate in every worker process: use a shared
+# backend (Redis, Memcached, database, files) when running several of them
+API_CACHE_ALIAS = os.environ.get('API_CACHE_ALIAS', 'default')
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+# Bounds how long a worker that missed a version bump keeps answering
+# with the old ETag
+API_CACHE_VERSION_TTL = int(
+    os.environ.get('API_CACHE_VERSION_TTL', API_CACHE_TIMEOUT))
+# Revoked tokens are dropped from this cache only in the process that
+# revoked them, so it has to be shared as well
+AUTH_TOKEN_CACHE_ALIAS = os.environ.get('AUTH_TOKEN_CACHE_ALIAS', 'default')
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 300))
+# With a per-process cache the login limit is multiplied by the number of
+# workers
+THROTTLE_CACHE_ALIAS = os.environ.get('THROTTLE_CACHE_ALIAS', 'default')
+
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'simple')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'app.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('LOGIN_THROTTLE_RATE', '10/min'),
+    },
 }
 
 MEDIA_URL = 'photos/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'photos')
+# python, x-accel-redirect (nginx) or x-sendfile (apache, lighttpd)
+MEDIA_SERVE_BACKEND = os.environ.get('MEDIA_SERVE_BACKEND', 'python')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 31536000))
+MEDIA_SIGNED_URLS = os.environ.get('MEDIA_SIGNED_URLS', 'True') == 'True'
+MEDIA_SIGNING_KEY = os.environ.get('MEDIA_SIGNING_KEY', SECRET_KEY)
+MEDIA_SIGNED_URL_TTL = int(os.environ.get('MEDIA_SIGNED_URL_TTL', 6 * 3600))
+MEDIA_SIGNED_URL_BUCKET = int(os.environ.get('MEDIA_SIGNED_URL_BUCKET', 3600))
 
 FILE_UPLOAD_HANDLERS = [
-    'django.core.files.uploadhandler.MemoryFileUploadHandler',
-    'app.handlers.SizeLimitUploadHandler'
+    'app.handlers.SizeLimitUploadHandler',
+    'app.handlers.HashingMemoryFileUploadHandler',
+    'app.handlers.HashingTemporaryFileUploadHandler',
 ]
 MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+MAX_REQUEST_UPLOAD_SIZE = int(
+    os.environ.get('MAX_REQUEST_UPLOAD_SIZE', 100 * 1024 * 1024))
+MAX_BULK_UPLOAD_FILES = 100
+MAX_BULK_MOVE_PHOTOS = 1000
+MAX_BULK_UPDATE_PHOTOS = 500
+ALBUM_PREVIEW_SIZE = 4
+ALLOWED_IMAGE_FORMATS = ['JPEG', 'PNG']
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 50_000_000))
+SIMILAR_PHOTOS_DISTANCE = 6
+DUPLICATE_PHOTOS_DISTANCE = 3
+MAX_SIMILAR_PHOTOS_DISTANCE = 12
+MAX_SIMILAR_PHOTOS = 100
+CHUNKED_UPLOAD_MAX_SIZE = int(
+    os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 50 * 1024 * 1024))
+CHUNKED_UPLOAD_DIR = os.environ.get(
+    'CHUNKED_UPLOAD_DIR',
+    os.path.join(tempfile.gettempdir(), 'photogallery-uploads'))
+# Sessions not finalized within this many seconds are deleted
+CHUNKED_UPLOAD_TTL = int(os.environ.get('CHUNKED_UPLOAD_TTL', 24 * 3600))
+
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 2))
+BACKGROUND_TASKS_EAGER = os.environ.get('BACKGROUND_TASKS_EAGER') == 'True'
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Фотоальбом',
@@ -1,22 +1,23 @@
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from rest_framework import routers
 
 
-from app.views import AlbumViewSet, PhotoViewSet
-from config import settings
+from app.views import (AlbumViewSet, PhotoViewSet, SignedMediaView,
+                       UploadSessionViewSet)
 from users import urls
 
 router = routers.SimpleRouter()
 router.register(r'albums', AlbumViewSet, 'albums')
 router.register(r'photos', PhotoViewSet, 'photos')
+router.register(r'uploads', UploadSessionViewSet, 'uploads')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include([
         path('', include(router.urls)),
+        path('media/<path:name>', SignedMediaView.as_view(), name='media'),
         path('users/', include(urls)),
         path('docs/', include([
             path('schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -26,6 +27,3 @@ urlpatterns = [
         ])
     )
 ]
-
-urlpatterns += static(settings.MEDIA_URL,
-                      document_root=settings.MEDIA_ROOT)
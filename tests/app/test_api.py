@@ -1,14 +1,66 @@
+import fcntl
+import hashlib
+import json
 import os
+import random
 import shutil
+import struct
 import time
+import uuid
+import zipfile
+from base64 import b64encode
+from datetime import timedelta
+from io import BytesIO
+
 import pytest
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.http import urlencode
 
-from app.models import Album, Photo
+from app import caching, checks, media, phash, search, tasks, uploads
+from app.exceptions import UploadOffsetError
+from app.models import Album, Photo, UploadSession
+from app.renditions import RENDITIONS, get_rendition_path
 from config import settings
 
+QUERY_BUDGETS = {
+    'albums-list': 1,
+    'albums-detail': 3,
+    'photos-list': 2,
+    'photos-detail': 2,
+}
+
+
+def make_exif_photo(name='exif.jpg', size=(40, 20), make='Canon',
+                    model='EOS 5D', taken_at='2021:07:04 12:30:00',
+                    offset='+03:00', orientation=1, location=None):
+    exif = Image.Exif()
+    exif[0x010F], exif[0x0110], exif[0x0112] = make, model, orientation
+    exif[0x8769] = {0x9003: taken_at, 0x9011: offset}
+    if location:
+        exif[0x8825] = location
+    content = BytesIO()
+    Image.new('RGB', size).save(content, 'jpeg', exif=exif.tobytes())
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+def make_pattern_photo(seed, edited=0, name='pattern.jpg'):
+    rng = random.Random(seed)
+    pixels = [rng.randrange(40, 216) for _ in range(72)]
+    for index in range(edited):
+        pixels[index * 9 + 4] = 255 - pixels[index * 9 + 4]
+    image = Image.new('L', (9, 8))
+    image.putdata(pixels)
+    image = image.resize((360, 320), Image.Resampling.NEAREST)
+    content = BytesIO()
+    image.convert('RGB').save(content, 'jpeg')
+    return SimpleUploadedFile(name, content.getvalue())
+
 
 @pytest.mark.django_db
 class TestAlbum:
@@ -44,8 +96,8 @@ class TestAlbum:
         url = reverse('albums-list')
         response = api_client.get(url)
         assert response.status_code == 200
-        assert isinstance(response.json(), list)
-        assert len(response.json()) == len(albums)
+        assert isinstance(response.json()['results'], list)
+        assert len(response.json()['results']) == len(albums)
     
     def test_retrieve_album(self, api_client, user_factory, album_factory):
         user = user_factory()
@@ -59,6 +111,88 @@ class TestAlbum:
         assert response.json()['title'] == album.title
         assert response.json()['owner'] == user.username
     
+    def test_retrieve_album_paginates_photos(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photos = photo_factory(
+            _quantity=3, owner=user, album=album, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        url = reverse('albums-detail', kwargs={'pk': album.pk}) + '?' + \
+            urlencode({'page_size': 2})
+        response = api_client.get(url)
+        assert response.json()['photos_amount'] == 3
+        assert len(response.json()['photos']['results']) == 2
+        response = api_client.get(response.json()['photos']['next'])
+        assert len(response.json()['photos']['results']) == 1
+        assert response.json()['photos']['next'] is None
+        assert response.json()['photos']['results'][0]['id'] in \
+               [photo.id for photo in photos]
+    
+    def test_album_preview_is_maintained(self, api_client, user_factory,
+                                         album_factory, photo_factory):
+        user = user_factory()
+        album, other = album_factory(_quantity=2, owner=user)
+        photos = [
+            photo_factory(owner=user, album=album,
+                          photo=make_pattern_photo(seed))
+            for seed in range(5)
+        ]
+        api_client.force_authenticate(user=user)
+        
+        def get_albums():
+            response = api_client.get(reverse('albums-list'))
+            return {item['id']: item for item in response.json()['results']}
+        
+        data = get_albums()[album.pk]
+        assert data['photos_amount'] == 5
+        assert [item['id'] for item in data['preview']] == \
+            [photo.pk for photo in photos[:0:-1]]
+        assert data['cover']['id'] == photos[-1].pk
+        assert data['cover']['thumbnail'] is not None
+        assert data['last_uploaded_at'] == timezone.localtime(
+            Photo.objects.get(pk=photos[-1].pk).uploaded_at
+        ).strftime('%Y-%m-%d %H:%M:%S')
+        api_client.post(reverse('photos-move'), data={
+            'album': other.pk, 'photos': [photos[-1].pk]}, format='json')
+        api_client.delete(
+            reverse('photos-detail', kwargs={'pk': photos[0].pk}))
+        data = get_albums()
+        assert data[album.pk]['photos_amount'] == 3
+        assert [item['id'] for item in data[album.pk]['preview']] == \
+            [photo.pk for photo in photos[3:0:-1]]
+        assert data[other.pk]['photos_amount'] == 1
+        assert data[other.pk]['cover']['id'] == photos[-1].pk
+    
+    def test_thumbnail_refreshes_preview_not_stored_yet(
+            self, user_factory, album_factory, photo_factory, photo_file):
+        album = album_factory(owner=user_factory())
+        photo = photo_factory(album=album, photo=photo_file())
+        # The refresh queued with the upload has not run yet
+        Album.objects.filter(pk=album.pk).update(preview=[])
+        tasks.generate_thumbnail(photo.pk)
+        photo.refresh_from_db()
+        album.refresh_from_db()
+        assert album.preview == [
+            {'id': photo.pk, 'thumbnail': photo.thumbnail.name}]
+    
+    def test_thumbnail_reuses_stored_file(
+            self, user_factory, album_factory, photo_factory, photo_file):
+        album = album_factory(owner=user_factory())
+        photo = photo_factory(album=album, photo=photo_file())
+        tasks.generate_thumbnail(photo.pk)
+        thumbnail = Photo.objects.get(pk=photo.pk).thumbnail.name
+        # The file is stored, but no photo references it as ready
+        Photo.objects.filter(pk=photo.pk).update(
+            thumbnail='', thumbnail_status=Photo.ThumbnailStatus.PENDING)
+        tasks.generate_thumbnail(photo.pk)
+        photo.refresh_from_db()
+        assert photo.thumbnail.name == thumbnail
+        assert photo.thumbnail_status == Photo.ThumbnailStatus.READY
+        directory, name = os.path.split(thumbnail)
+        assert default_storage.listdir(directory)[1] == [name]
+    
     def test_retrieve_album_not_owned_by_user(
             self, api_client, user_factory, album_factory):
         user = user_factory(_quantity=2)
@@ -96,7 +230,7 @@ class TestAlbum:
         assert response.json()['owner'] == album.owner.username
         assert response.json()['created_at'] == \
                album.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        assert response.json()['photos_amount'] == album.photos_amount
+        assert response.json()['photos_amount'] == album.photos_count
     
     def test_delete_own_album(
             self, api_client, user_factory, album_factory):
@@ -109,6 +243,89 @@ class TestAlbum:
         assert response.status_code == 204
         assert Album.objects.count() == album_count_before - 1
     
+    def test_delete_album_releases_files_in_one_job(
+            self, api_client, monkeypatch, user_factory, album_factory,
+            photo_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photos = photo_factory(
+            _quantity=3, owner=user, album=album, photo=photo_file())
+        content = BytesIO()
+        Image.new('RGB', (10, 10), 'red').save(content, 'jpeg')
+        other = photo_factory(owner=user, photo=SimpleUploadedFile(
+            'other.jpg', content.getvalue()))
+        names = [Photo.objects.get(pk=photo.pk).photo.name
+                 for photo in photos]
+        jobs = []
+        release_files = tasks.release_files
+        monkeypatch.setattr(
+            tasks, 'release_files',
+            lambda files: jobs.append(files) or release_files(files))
+        api_client.force_authenticate(user=user)
+        response = api_client.delete(
+            reverse('albums-detail', kwargs={'pk': album.pk}))
+        assert response.status_code == 204
+        assert len(jobs) == 1 and len(jobs[0]) == 3
+        assert not any(default_storage.exists(name) for name in names)
+        assert default_storage.exists(other.photo.name)
+    
+    def test_download_album(self, api_client, user_factory, album_factory,
+                            photo_factory):
+        user = user_factory()
+        album = album_factory(owner=user, title='Summer')
+        files = [make_pattern_photo(seed) for seed in range(3)]
+        for file, title in zip(files, ['Sea', 'Sea', 'a/b']):
+            photo_factory(owner=user, album=album, title=title, photo=file)
+        api_client.force_authenticate(user=user)
+        response = api_client.get(
+            reverse('albums-download', kwargs={'pk': album.pk}))
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/zip'
+        assert "filename*=UTF-8''Summer.zip" in \
+            response['Content-Disposition']
+        content = b''.join(response.streaming_content)
+        assert len(content) == int(response['Content-Length'])
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            assert archive.testzip() is None
+            assert archive.namelist() == ['Sea.jpg', 'Sea (2).jpg', 'a_b.jpg']
+            assert {info.compress_type for info in archive.infolist()} == \
+                {zipfile.ZIP_STORED}
+            assert archive.read('Sea (2).jpg') == make_pattern_photo(1).read()
+    
+    @pytest.mark.parametrize('first', [0, 10, 700, 2000])
+    def test_download_album_resume(self, api_client, user_factory,
+                                   album_factory, photo_factory, first):
+        user = user_factory()
+        album = album_factory(owner=user)
+        for seed in range(2):
+            photo_factory(owner=user, album=album,
+                          photo=make_pattern_photo(seed))
+        api_client.force_authenticate(user=user)
+        url = reverse('albums-download', kwargs={'pk': album.pk})
+        response = api_client.get(url)
+        content = b''.join(response.streaming_content)
+        response = api_client.get(
+            url, HTTP_RANGE=f'bytes={first}-',
+            HTTP_IF_RANGE=response['ETag'])
+        assert response.status_code == 206
+        assert response['Content-Range'] == \
+            f'bytes {first}-{len(content) - 1}/{len(content)}'
+        assert b''.join(response.streaming_content) == content[first:]
+        response = api_client.get(url, HTTP_RANGE='bytes=5-9')
+        assert b''.join(response.streaming_content) == content[5:10]
+        response = api_client.get(
+            url, HTTP_RANGE=f'bytes={len(content)}-')
+        assert response.status_code == 416
+    
+    def test_download_album_not_owned_by_user(
+            self, api_client, user_factory, album_factory):
+        user = user_factory()
+        album = album_factory()
+        api_client.force_authenticate(user=user)
+        response = api_client.get(
+            reverse('albums-download', kwargs={'pk': album.pk}))
+        assert response.status_code == 404
+    
     def test_delete_album_not_owned_by_user(
             self, api_client, user_factory, album_factory):
         user = user_factory(_quantity=2)
@@ -142,10 +359,28 @@ class TestAlbum:
         query_params = {'ordering': ordering_field}
         url = reverse('albums-list') + '?' + urlencode(query_params)
         response = api_client.get(url)
-        assert response.json()[index0][model_field] > \
-               response.json()[index1][model_field]
+        results = response.json()['results']
+        assert results[index0][model_field] > results[index1][model_field]
 
 
+    def test_list_albums_cursor_pagination_by_photos_count(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        albums = album_factory(_quantity=3, owner=user)
+        for amount, album in enumerate(albums, start=1):
+            photo_factory(
+                _quantity=amount, album=album, owner=user, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        query_params = {'ordering': '-photos_count', 'page_size': 1}
+        url = reverse('albums-list') + '?' + urlencode(query_params)
+        ids = []
+        while url:
+            response = api_client.get(url)
+            ids += [item['id'] for item in response.json()['results']]
+            url = response.json()['next']
+        assert ids == [album.id for album in reversed(albums)]
+
 @pytest.mark.django_db
 class TestPhoto:
     
@@ -160,9 +395,58 @@ class TestPhoto:
         url = reverse('photos-list')
         response = api_client.get(url)
         assert response.status_code == 200
-        assert isinstance(response.json(), list)
-        assert len(response.json()) == len(photos_of_user1)
+        assert isinstance(response.json()['results'], list)
+        assert len(response.json()['results']) == len(photos_of_user1)
     
+    @pytest.mark.parametrize('ordering', [None, 'album', '-uploaded_at'])
+    def test_list_photos_cursor_pagination(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file, ordering):
+        user = user_factory()
+        albums = album_factory(_quantity=2, owner=user)
+        photos = photo_factory(
+            _quantity=3, owner=user, album=albums[0], photo=photo_file())
+        photos += photo_factory(
+            _quantity=4, owner=user, album=albums[1], photo=photo_file())
+        api_client.force_authenticate(user=user)
+        query_params = {'page_size': 3}
+        if ordering:
+            query_params['ordering'] = ordering
+        url = reverse('photos-list') + '?' + urlencode(query_params)
+        pages = []
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == 200
+            pages.append(response.json())
+            url = response.json()['next']
+        assert [len(page['results']) for page in pages] == [3, 3, 1]
+        ids = [item['id'] for page in pages for item in page['results']]
+        assert sorted(ids) == sorted(photo.id for photo in photos)
+        response = api_client.get(pages[-1]['previous'])
+        assert response.json()['results'] == pages[-2]['results']
+
+    def test_list_photos_invalid_cursor(self, api_client, user_factory):
+        api_client.force_authenticate(user=user_factory())
+        url = reverse('photos-list') + '?' + urlencode({'cursor': 'invalid'})
+        response = api_client.get(url)
+        assert response.status_code == 404
+    
+    @pytest.mark.parametrize('position', [
+        ['notadate', 1],
+        [{'a': 1}, 1],
+        ['2020-01-01T00:00:00+00:00', 'x'],
+        [None, 1],
+    ])
+    def test_list_photos_cursor_with_invalid_values(
+            self, api_client, user_factory, position):
+        api_client.force_authenticate(user=user_factory())
+        cursor = b64encode(json.dumps({'p': position, 'r': 0}).encode())
+        url = reverse('photos-list') + '?' + urlencode(
+            {'cursor': cursor.decode()})
+        response = api_client.get(url)
+        assert response.status_code == 404
+        assert response.json() == {'detail': 'Invalid cursor'}
+
     def test_retrieve_own_photo(self, api_client, user_factory, album_factory,
                                 photo_factory, photo_file):
         user = user_factory()
@@ -200,6 +484,17 @@ class TestPhoto:
         response = api_client.post(url, data=data, format='multipart')
         assert response.status_code == 404
         assert Photo.objects.count() == photo_count_before
+    
+    @pytest.mark.parametrize('album', ['abc', '1.5', ''])
+    def test_create_photo_with_invalid_album_id(
+            self, api_client, user_factory, photo_file, album):
+        user = user_factory()
+        data = {'title': 'Test photo', 'album': album, 'photo': photo_file()}
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('photos-list'), data=data, format='multipart')
+        assert response.status_code == 404
+        assert not Photo.objects.exists()
         
     def test_create_photo_in_owned_album(
             self, api_client, user_factory, album_factory, photo_file):
@@ -219,6 +514,66 @@ class TestPhoto:
         assert response.json()['title'] == data['title']
         assert Photo.objects.count() == photo_count_before + 1
 
+    def test_create_photo_generates_thumbnail_in_background(
+            self, api_client, user_factory, album_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        data = {
+            'title': 'Test photo',
+            'album': album.pk,
+            'photo': photo_file()
+        }
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('photos-list'), data=data, format='multipart')
+        assert response.status_code == 201
+        assert response.json()['thumbnail_status'] == 'pending'
+        url = reverse('photos-detail', kwargs={'pk': response.json()['id']})
+        response = api_client.get(url)
+        assert response.json()['thumbnail_status'] == 'ready'
+        assert response.json()['thumbnail'] is not None
+        thumbnail = Photo.objects.get(pk=response.json()['id']).thumbnail
+        assert Image.open(thumbnail).size == (150, 84)
+
+    def test_update_photo_keeps_thumbnail(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        photo.refresh_from_db()
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-detail', kwargs={'pk': photo.pk})
+        response = api_client.patch(url, data={'title': 'Updated title'})
+        assert response.status_code == 200
+        assert response.json()['thumbnail_status'] == 'ready'
+        assert Photo.objects.get(pk=photo.pk).thumbnail == photo.thumbnail
+
+    def test_photo_rendition(self, api_client, user_factory, album_factory,
+                             photo_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        response = api_client.get(
+            reverse('photos-detail', kwargs={'pk': photo.pk}))
+        assert set(response.json()['renditions']) == set(RENDITIONS)
+        response = api_client.get(response.json()['renditions']['small_webp'])
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'image/webp'
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        assert max(image.size) == 320
+        assert default_storage.exists(get_rendition_path(photo, 'small_webp'))
+
+    def test_unknown_photo_rendition(self, api_client, user_factory,
+                                     album_factory, photo_factory, photo_file):
+        user = user_factory()
+        photo = photo_factory(owner=user, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-rendition', kwargs={'pk': photo.pk, 'name': 'xl'})
+        response = api_client.get(url, HTTP_ACCEPT='image/*')
+        assert response.status_code == 404
+
     def test_create_photo_exceeding_maximum_upload_size(
             self, api_client, user_factory, album_factory, photo_file):
         user = user_factory()
@@ -235,6 +590,49 @@ class TestPhoto:
         assert response.status_code == 413
         assert Photo.objects.count() == photo_count_before
 
+    @pytest.mark.parametrize('name, format', [
+        ('not_image.jpg', None),
+        ('animation.gif', 'gif'),
+    ])
+    def test_create_photo_rejects_unsupported_file(
+            self, api_client, user_factory, album_factory, name, format):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = BytesIO(b'plain text, not an image')
+        if format:
+            content = BytesIO()
+            Image.new('RGB', (10, 10)).save(content, format)
+        data = {
+            'title': 'Test photo',
+            'album': album.pk,
+            'photo': SimpleUploadedFile(name, content.getvalue())
+        }
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('photos-list'), data=data, format='multipart')
+        assert response.status_code == 400
+        assert 'photo' in response.json()
+        assert not Photo.objects.exists()
+
+    def test_create_photo_exceeding_maximum_pixels(
+            self, api_client, monkeypatch, user_factory, album_factory,
+            photo_file):
+        monkeypatch.setattr(settings, 'MAX_IMAGE_PIXELS', 1000 * 1000)
+        user = user_factory()
+        album = album_factory(owner=user)
+        data = {
+            'title': 'Test photo',
+            'album': album.pk,
+            'photo': photo_file()
+        }
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('photos-list'), data=data, format='multipart')
+        assert response.status_code == 400
+        assert response.json()['photo'] == [
+            'image dimensions exceed the allowed maximum']
+        assert not Photo.objects.exists()
+
     @pytest.mark.parametrize(
         'ordering_field, index0, index1',
         [
@@ -259,8 +657,9 @@ class TestPhoto:
         response = api_client.get(url)
         if ordering_field.startswith('-'):
             ordering_field = ordering_field[1:]
-        assert response.json()[index0][ordering_field] > \
-               response.json()[index1][ordering_field]
+        results = response.json()['results']
+        assert results[index0][ordering_field] > \
+               results[index1][ordering_field]
         
     def test_photo_filter_by_tags(self, api_client, user_factory, photo_factory,
                                   album_factory, photo_file):
@@ -279,10 +678,128 @@ class TestPhoto:
         query_params = {'tags': 'test1'}
         url = reverse('photos-list') + '?' + urlencode(query_params)
         response = api_client.get(url)
-        assert len(response.json()) == 2
-        for item in response.json():
+        assert len(response.json()['results']) == 2
+        for item in response.json()['results']:
             assert 'test1' in item['tags']
     
+    @pytest.mark.parametrize(
+        'query_params, expected',
+        [
+            ({'tags': 'test1,test2'}, [0, 1, 2]),
+            ({'tags_all': 'test1,test2'}, [2]),
+            ({'tags_exclude': 'test2'}, [0, 3]),
+            ({'tags': 'test1', 'tags_exclude': 'test2'}, [0]),
+        ]
+    )
+    def test_photo_filter_by_tags_modes(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file, query_params, expected):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photos = photo_factory(
+            _quantity=4, owner=user, album=album, photo=photo_file())
+        photos[0].tags.add('test1')
+        photos[1].tags.add('test2')
+        photos[2].tags.add('test1', 'test2')
+        photos[3].tags.add('test3')
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-list') + '?' + urlencode(query_params)
+        response = api_client.get(url)
+        ids = [item['id'] for item in response.json()['results']]
+        assert sorted(ids) == sorted(photos[index].id for index in expected)
+    
+    def test_create_photo_extracts_exif(self, api_client, user_factory,
+                                        album_factory):
+        user = user_factory()
+        album = album_factory(owner=user)
+        location = {1: 'S', 2: (33.0, 51.0, 36.0), 3: 'E',
+                    4: (151.0, 12.0, 36.0)}
+        data = {
+            'title': 'Sydney', 'album': album.pk,
+            'photo': make_exif_photo(orientation=6, location=location)
+        }
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('photos-list'), data=data, format='multipart')
+        assert response.status_code == 201
+        result = response.json()
+        assert (result['width'], result['height']) == (20, 40)
+        assert result['camera_make'] == 'Canon'
+        assert result['camera_model'] == 'EOS 5D'
+        assert result['taken_at'] == '2021-07-04 09:30:00'
+        assert result['captured_at'] == result['taken_at']
+        assert result['latitude'] == pytest.approx(-33.86)
+        assert result['longitude'] == pytest.approx(151.21)
+    
+    def test_create_photo_with_corrupt_exif(self, api_client, user_factory,
+                                            album_factory):
+        user = user_factory()
+        album = album_factory(owner=user)
+        # EXIF and GPS IFD pointers stored as text instead of offsets
+        entries = [struct.pack('<HHI4s', tag, 2, 4, b'abc\x00')
+                   for tag in (0x8769, 0x8825)]
+        exif = b'Exif\x00\x00II*\x00' + struct.pack('<IH', 8, 2) + \
+            b''.join(entries) + struct.pack('<I', 0)
+        content = BytesIO()
+        Image.new('RGB', (40, 20)).save(content, 'jpeg', exif=exif)
+        data = {
+            'title': 'Corrupt', 'album': album.pk,
+            'photo': SimpleUploadedFile('corrupt.jpg', content.getvalue())
+        }
+        api_client.force_authenticate(user=user)
+        response = api_client.post(
+            reverse('photos-list'), data=data, format='multipart')
+        assert response.status_code == 201
+        result = response.json()
+        assert (result['width'], result['height']) == (40, 20)
+        assert result['taken_at'] is None
+        assert result['latitude'] is None
+    
+    def test_photo_without_exif_captured_at_upload(
+            self, user_factory, album_factory, photo_factory, photo_file):
+        photo = photo_factory(photo=photo_file())
+        photo.refresh_from_db()
+        assert photo.taken_at is None
+        assert (photo.width, photo.height) == (1920, 1080)
+        assert abs(photo.captured_at - photo.uploaded_at).total_seconds() < 1
+    
+    @pytest.mark.parametrize(
+        'query_params, expected',
+        [
+            ({'captured_after': '2021-01-01T00:00:00Z'}, [1, 2]),
+            ({'captured_before': '2021-01-01T00:00:00Z'}, [0]),
+            ({'camera_make': 'Nikon'}, [2]),
+            ({'has_location': 'true'}, [1]),
+            ({'has_location': 'false'}, [0, 2]),
+            ({'lat_min': 50, 'lat_max': 60, 'lon_min': 30, 'lon_max': 40},
+             [1]),
+            ({'lat_min': -10}, [1]),
+            ({'ordering': 'captured_at'}, [0, 1, 2]),
+            ({'ordering': '-captured_at'}, [2, 1, 0]),
+        ]
+    )
+    def test_photo_filter_by_metadata(self, api_client, user_factory,
+                                      album_factory, photo_factory,
+                                      query_params, expected):
+        user = user_factory()
+        album = album_factory(owner=user)
+        moscow = {1: 'N', 2: (55.0, 45.0, 0.0), 3: 'E', 4: (37.0, 37.0, 0.0)}
+        files = [
+            make_exif_photo(taken_at='2019:05:01 10:00:00'),
+            make_exif_photo(taken_at='2021:05:01 10:00:00', location=moscow),
+            make_exif_photo(taken_at='2022:05:01 10:00:00', make='Nikon'),
+        ]
+        photos = [photo_factory(owner=user, album=album, photo=file)
+                  for file in files]
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-list') + '?' + urlencode(query_params)
+        response = api_client.get(url)
+        assert response.status_code == 200
+        ids = [item['id'] for item in response.json()['results']]
+        if 'ordering' not in query_params:
+            ids.sort()
+        assert ids == [photos[index].id for index in expected]
+    
     def test_update_own_photo(self, api_client, user_factory, album_factory,
                                 photo_factory, photo_file):
         user = user_factory()
@@ -317,6 +834,23 @@ class TestPhoto:
         assert response.json()['uploaded_at'] == \
                photo.uploaded_at.strftime("%Y-%m-%d %H:%M:%S")
     
+    def test_move_photo_to_album_not_owned_by_user(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user, victim = user_factory(_quantity=2)
+        album = album_factory(owner=user)
+        foreign_album = album_factory(owner=victim)
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        response = api_client.patch(
+            reverse('photos-detail', kwargs={'pk': photo.pk}),
+            data={'album': foreign_album.pk})
+        assert response.status_code == 404
+        assert Photo.objects.get(pk=photo.pk).album == album
+        foreign_album.refresh_from_db()
+        assert foreign_album.photos_count == 0
+        assert foreign_album.preview == []
+    
     def test_delete_own_photo(self, api_client, user_factory, album_factory,
                               photo_factory, photo_file):
         user = user_factory()
@@ -328,3 +862,898 @@ class TestPhoto:
         response = api_client.delete(url)
         assert response.status_code == 204
         assert Photo.objects.count() == photo_count_before - 1
+    
+    def test_duplicate_upload_reuses_blob_and_thumbnail(
+            self, api_client, user_factory, album_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = photo_file().read()
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-list')
+        responses = [
+            api_client.post(url, format='multipart', data={
+                'title': 'Duplicate', 'album': album.pk,
+                'photo': SimpleUploadedFile('photo.jpg', content)})
+            for _ in range(2)
+        ]
+        assert [r.status_code for r in responses] == [201, 201]
+        first, second = Photo.objects.order_by('pk')
+        assert first.content_hash == hashlib.sha256(content).hexdigest()
+        assert second.content_hash == first.content_hash
+        assert second.photo.name == first.photo.name
+        assert second.thumbnail.name == first.thumbnail.name
+        assert responses[1].json()['thumbnail_status'] == 'ready'
+        query_params = {'content_hash': first.content_hash}
+        response = api_client.get(url + '?' + urlencode(query_params))
+        assert len(response.json()['results']) == 2
+    
+    def test_delete_releases_unreferenced_blob(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photos = photo_factory(
+            _quantity=2, owner=user, album=album, photo=photo_file())
+        for photo in photos:
+            photo.refresh_from_db()
+        name, thumbnail = photos[0].photo.name, photos[0].thumbnail.name
+        api_client.force_authenticate(user=user)
+        api_client.delete(reverse('photos-detail', args=[photos[0].pk]))
+        assert default_storage.exists(name)
+        assert default_storage.exists(thumbnail)
+        api_client.delete(reverse('photos-detail', args=[photos[1].pk]))
+        assert not default_storage.exists(name)
+        assert not default_storage.exists(thumbnail)
+    
+    def test_upload_restores_files_released_before_commit(
+            self, monkeypatch, user_factory, album_factory, photo_factory,
+            photo_file, django_capture_on_commit_callbacks):
+        user = user_factory()
+        album = album_factory(owner=user)
+        previous = photo_factory(owner=user, album=album, photo=photo_file())
+        previous.refresh_from_db()
+        name, thumbnail = previous.photo.name, previous.thumbnail.name
+        store_content = Photo.store_content
+        
+        def store_content_and_release(photo):
+            store_content(photo)
+            # The reused copy is deleted and released before the upload
+            # is committed
+            previous.delete()
+            assert not default_storage.exists(name)
+        
+        monkeypatch.setattr(
+            Photo, 'store_content', store_content_and_release)
+        with django_capture_on_commit_callbacks(execute=True):
+            photo = photo_factory(owner=user, album=album, photo=photo_file())
+        photo.refresh_from_db()
+        assert photo.photo.name == name
+        assert default_storage.exists(name)
+        assert photo.thumbnail.name == thumbnail
+        assert photo.thumbnail_status == Photo.ThumbnailStatus.READY
+        assert default_storage.exists(thumbnail)
+
+
+@pytest.mark.django_db
+class TestBulkPhotos:
+    
+    def test_bulk_create_photos(self, api_client, user_factory,
+                                album_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        data = {
+            'album': album.pk,
+            'photos': [photo_file() for _ in range(3)],
+            'tags': ['tag1', 'tag2']
+        }
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-bulk-create')
+        response = api_client.post(url, data=data, format='multipart')
+        assert response.status_code == 201
+        results = response.json()
+        assert [item['status'] for item in results] == ['created'] * 3
+        photos = Photo.objects.filter(pk__in=[item['id'] for item in results])
+        assert photos.count() == 3
+        for photo in photos:
+            assert photo.album == album
+            assert set(photo.tags.names()) == {'tag1', 'tag2'}
+            assert photo.thumbnail_status == Photo.ThumbnailStatus.READY
+        album.refresh_from_db()
+        assert album.photos_count == 3
+    
+    def test_bulk_create_reports_invalid_files(
+            self, api_client, user_factory, album_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        empty_file = SimpleUploadedFile('empty.jpg', b'')
+        data = {'album': album.pk, 'photos': [photo_file(), empty_file]}
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-bulk-create')
+        response = api_client.post(url, data=data, format='multipart')
+        assert [item['status'] for item in response.json()] == \
+               ['created', 'error']
+        assert Photo.objects.filter(album=album).count() == 1
+    
+    def test_bulk_create_in_album_not_owned_by_user(
+            self, api_client, user_factory, album_factory, photo_file):
+        user = user_factory(_quantity=2)
+        album = album_factory(owner=user[0])
+        api_client.force_authenticate(user=user[1])
+        data = {'album': album.pk, 'photos': [photo_file()]}
+        url = reverse('photos-bulk-create')
+        response = api_client.post(url, data=data, format='multipart')
+        assert response.status_code == 404
+        assert not Photo.objects.filter(album=album).exists()
+    
+    def test_bulk_update_photos(self, api_client, user_factory,
+                                album_factory, photo_factory, photo_file,
+                                monkeypatch):
+        user = user_factory(_quantity=2)
+        album, other_album = album_factory(_quantity=2, owner=user[0])
+        foreign_album = album_factory(owner=user[1])
+        photos = photo_factory(
+            _quantity=3, owner=user[0], album=album, photo=photo_file())
+        foreign_photo = photo_factory(
+            owner=user[1], album=foreign_album, photo=photo_file())
+        photos[0].tags.add('old tag')
+        data = [
+            {'id': photos[0].pk, 'title': 'New title', 'tags': ['new tag']},
+            {'id': photos[1].pk, 'album': other_album.pk},
+            {'id': photos[2].pk, 'album': foreign_album.pk},
+            {'id': foreign_photo.pk, 'title': 'Hijacked'},
+        ]
+        api_client.force_authenticate(user=user[0])
+        url = reverse('photos-bulk-create')
+        # Only the request itself counts, background tasks run after commit.
+        monkeypatch.setattr(settings, 'BACKGROUND_TASKS_EAGER', False)
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.patch(url, data=data)
+        assert response.status_code == 200
+        assert [item['status'] for item in response.json()] == \
+               ['updated', 'updated', 'error', 'error']
+        photos[0].refresh_from_db()
+        assert photos[0].title == 'New title'
+        assert list(photos[0].tags.names()) == ['new tag']
+        assert Photo.objects.get(pk=photos[1].pk).album == other_album
+        assert Photo.objects.get(pk=photos[2].pk).album == album
+        assert Photo.objects.get(pk=foreign_photo.pk).title != 'Hijacked'
+        assert len(context.captured_queries) < 15
+        counts = dict(Album.objects.values_list('pk', 'photos_count'))
+        assert (counts[album.pk], counts[other_album.pk]) == (2, 1)
+    
+    def test_move_photos(self, api_client, user_factory, album_factory,
+                         photo_factory, photo_file):
+        user, other_user = user_factory(_quantity=2)
+        album, target = album_factory(_quantity=2, owner=user)
+        photos = photo_factory(
+            _quantity=3, owner=user, album=album, photo=photo_file())
+        names = [Photo.objects.get(pk=photo.pk).photo.name
+                 for photo in photos]
+        foreign_photo = photo_factory(owner=other_user, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        data = {
+            'album': target.pk,
+            'photos': [photo.pk for photo in photos] + [foreign_photo.pk]
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.post(
+                reverse('photos-move'), data=data, format='json')
+        assert response.status_code == 200
+        assert response.json() == {
+            'album': target.pk, 'moved': 3, 'not_found': [foreign_photo.pk]}
+        moved = Photo.objects.filter(album=target).order_by('pk')
+        assert [photo.photo.name for photo in moved] == names
+        assert Photo.objects.get(pk=foreign_photo.pk).album != target
+        photos[0].refresh_from_db()
+        assert photos[0].search_document.endswith(target.title.lower())
+        assert len(context.captured_queries) < 15
+    
+    def test_bulk_update_too_many_photos(self, api_client, monkeypatch,
+                                         user_factory):
+        monkeypatch.setattr(settings, 'MAX_BULK_UPDATE_PHOTOS', 2)
+        api_client.force_authenticate(user=user_factory())
+        data = [{'id': pk, 'title': 'New title'} for pk in range(1, 4)]
+        response = api_client.patch(
+            reverse('photos-bulk-create'), data=data)
+        assert response.status_code == 400
+    
+    def test_move_photos_to_album_not_owned_by_user(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        photo = photo_factory(owner=user, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        data = {'album': album_factory().pk, 'photos': [photo.pk]}
+        response = api_client.post(
+            reverse('photos-move'), data=data, format='json')
+        assert response.status_code == 404
+    
+    def test_move_relocates_legacy_files(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        album, target = album_factory(_quantity=2, owner=user)
+        content = photo_file().read()
+        legacy = default_storage.save(
+            f'user_{user.pk}/album_{album.pk}/legacy.jpg',
+            SimpleUploadedFile('legacy.jpg', content))
+        legacy_thumbnail = default_storage.save(
+            f'user_{user.pk}/album_{album.pk}/thumbnails/thumb_legacy.jpg',
+            SimpleUploadedFile('legacy.jpg', content))
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        Photo.objects.filter(pk=photo.pk).update(
+            photo=legacy, thumbnail=legacy_thumbnail, content_hash='',
+            thumbnail_status=Photo.ThumbnailStatus.READY)
+        api_client.force_authenticate(user=user)
+        data = {'album': target.pk, 'photos': [photo.pk]}
+        response = api_client.post(
+            reverse('photos-move'), data=data, format='json')
+        assert response.status_code == 200
+        photo.refresh_from_db()
+        assert photo.content_hash == hashlib.sha256(content).hexdigest()
+        assert photo.photo.name.startswith('blobs/')
+        assert photo.thumbnail.name.startswith('thumbnails/')
+        assert default_storage.exists(photo.photo.name)
+        assert default_storage.exists(photo.thumbnail.name)
+        assert not default_storage.exists(legacy)
+        assert not default_storage.exists(legacy_thumbnail)
+    
+    def test_relocation_refreshes_album_preview(
+            self, user_factory, album_factory, photo_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = photo_file().read()
+        legacy = default_storage.save(
+            f'user_{user.pk}/album_{album.pk}/legacy.jpg',
+            SimpleUploadedFile('legacy.jpg', content))
+        legacy_thumbnail = default_storage.save(
+            f'user_{user.pk}/album_{album.pk}/thumbnails/thumb_legacy.jpg',
+            SimpleUploadedFile('legacy.jpg', content))
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        Photo.objects.filter(pk=photo.pk).update(
+            photo=legacy, thumbnail=legacy_thumbnail, content_hash='')
+        tasks.refresh_albums([album.pk])
+        tasks.relocate_legacy_files([photo.pk])
+        photo.refresh_from_db()
+        album.refresh_from_db()
+        assert album.preview == [
+            {'id': photo.pk, 'thumbnail': photo.thumbnail.name}]
+        assert not default_storage.exists(legacy_thumbnail)
+
+
+@pytest.mark.django_db
+class TestChunkedUpload:
+    
+    @staticmethod
+    def create_session(api_client, album, content):
+        data = {
+            'album': album.pk,
+            'title': 'Chunked photo',
+            'tags': ['tag1', 'tag2'],
+            'filename': 'chunked.jpg',
+            'size': len(content)
+        }
+        return api_client.post(reverse('uploads-list'), data=data)
+    
+    @staticmethod
+    def put_chunk(api_client, session_id, content, start, total):
+        url = reverse('uploads-detail', kwargs={'pk': session_id})
+        end = start + len(content) - 1
+        return api_client.put(
+            url, data=content, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total}')
+    
+    def test_chunked_upload(self, api_client, user_factory, album_factory,
+                            photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = photo_file().read()
+        middle = len(content) // 2
+        api_client.force_authenticate(user=user)
+        response = self.create_session(api_client, album, content)
+        assert response.status_code == 201
+        session_id = response.json()['id']
+        response = self.put_chunk(
+            api_client, session_id, content[:middle], 0, len(content))
+        assert response.json()['offset'] == middle
+        response = api_client.get(
+            reverse('uploads-detail', kwargs={'pk': session_id}))
+        assert response.json()['offset'] == middle
+        response = self.put_chunk(
+            api_client, session_id, content[middle:], middle, len(content))
+        assert response.json()['offset'] == len(content)
+        response = api_client.post(
+            reverse('uploads-finalize', kwargs={'pk': session_id}))
+        assert response.status_code == 201
+        photo = Photo.objects.get(pk=response.json()['id'])
+        assert photo.album == album
+        assert set(photo.tags.names()) == {'tag1', 'tag2'}
+        assert photo.photo.read() == content
+        assert not UploadSession.objects.filter(pk=session_id).exists()
+    
+    def test_abandoned_sessions_expire(self, api_client, monkeypatch,
+                                       tmp_path, user_factory, album_factory):
+        monkeypatch.setattr(settings, 'CHUNKED_UPLOAD_DIR', str(tmp_path))
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = b'abandoned upload'
+        api_client.force_authenticate(user=user)
+        session_id = self.create_session(
+            api_client, album, content).json()['id']
+        self.put_chunk(api_client, session_id, content[:8], 0, len(content))
+        expired = timedelta(seconds=settings.CHUNKED_UPLOAD_TTL + 1)
+        UploadSession.objects.filter(pk=session_id).update(
+            created_at=timezone.now() - expired)
+        orphan = tmp_path / f'{uuid.uuid4()}.part'
+        orphan.write_bytes(b'orphan')
+        old = time.time() - expired.total_seconds()
+        os.utime(orphan, (old, old))
+        response = self.create_session(api_client, album, content)
+        assert response.status_code == 201
+        assert not UploadSession.objects.filter(pk=session_id).exists()
+        assert list(tmp_path.iterdir()) == []
+        assert UploadSession.objects.filter(
+            pk=response.json()['id']).exists()
+    
+    def test_finalize_rejects_invalid_image(self, api_client, user_factory,
+                                            album_factory):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = b'plain text, not an image'
+        api_client.force_authenticate(user=user)
+        response = self.create_session(api_client, album, content)
+        session_id = response.json()['id']
+        self.put_chunk(api_client, session_id, content, 0, len(content))
+        response = api_client.post(
+            reverse('uploads-finalize', kwargs={'pk': session_id}))
+        assert response.status_code == 400
+        assert response.json()['photo'] == ['file is not a valid image']
+        assert not UploadSession.objects.filter(pk=session_id).exists()
+        assert not Photo.objects.exists()
+    
+    def test_chunk_offset_mismatch(self, api_client, user_factory,
+                                   album_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = photo_file().read()
+        api_client.force_authenticate(user=user)
+        response = self.create_session(api_client, album, content)
+        session_id = response.json()['id']
+        response = self.put_chunk(
+            api_client, session_id, content[10:], 10, len(content))
+        assert response.status_code == 409
+        assert int(response.json()['offset']) == 0
+    
+    def test_chunk_conflicts_with_concurrent_write(
+            self, api_client, monkeypatch, tmp_path, user_factory,
+            album_factory):
+        monkeypatch.setattr(settings, 'CHUNKED_UPLOAD_DIR', str(tmp_path))
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = b'0123456789'
+        api_client.force_authenticate(user=user)
+        session_id = self.create_session(
+            api_client, album, content).json()['id']
+        session = UploadSession.objects.get(pk=session_id)
+        with open(session.part_path, 'wb') as part:
+            fcntl.flock(part, fcntl.LOCK_EX)
+            response = self.put_chunk(
+                api_client, session_id, content, 0, len(content))
+        assert response.status_code == 409
+        
+        class Stream(BytesIO):
+            # Another server advances the offset while the body streams
+            def read(self, size=-1):
+                UploadSession.objects.filter(pk=session_id).update(offset=4)
+                return super().read(size)
+        
+        with pytest.raises(UploadOffsetError) as error:
+            uploads.write_chunk(session, Stream(content[:4]), 0, 4)
+        assert int(error.value.detail['offset']) == 4
+    
+    def test_chunk_exceeding_declared_size(self, api_client, user_factory,
+                                           album_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = photo_file().read()
+        api_client.force_authenticate(user=user)
+        response = self.create_session(api_client, album, content)
+        session_id = response.json()['id']
+        url = reverse('uploads-detail', kwargs={'pk': session_id})
+        response = api_client.put(
+            url, data=content + b'extra',
+            content_type='application/octet-stream')
+        assert response.status_code == 413
+        assert UploadSession.objects.get(pk=session_id).offset == 0
+    
+    def test_finalize_incomplete_upload(self, api_client, user_factory,
+                                        album_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        content = photo_file().read()
+        api_client.force_authenticate(user=user)
+        response = self.create_session(api_client, album, content)
+        session_id = response.json()['id']
+        response = api_client.post(
+            reverse('uploads-finalize', kwargs={'pk': session_id}))
+        assert response.status_code == 400
+    
+    def test_upload_session_exceeding_maximum_size(
+            self, api_client, user_factory, album_factory):
+        user = user_factory()
+        album = album_factory(owner=user)
+        api_client.force_authenticate(user=user)
+        data = {
+            'album': album.pk,
+            'title': 'Huge photo',
+            'filename': 'huge.jpg',
+            'size': settings.CHUNKED_UPLOAD_MAX_SIZE + 1
+        }
+        response = api_client.post(reverse('uploads-list'), data=data)
+        assert response.status_code == 413
+    
+    def test_upload_session_in_album_not_owned_by_user(
+            self, api_client, user_factory, album_factory, photo_file):
+        user = user_factory(_quantity=2)
+        album = album_factory(owner=user[0])
+        api_client.force_authenticate(user=user[1])
+        response = self.create_session(
+            api_client, album, photo_file().read())
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestConditionalRequests:
+    
+    def test_not_modified_by_etag(self, api_client, user_factory,
+                                  album_factory):
+        user = user_factory()
+        album_factory(owner=user)
+        api_client.force_authenticate(user=user)
+        url = reverse('albums-list')
+        response = api_client.get(url)
+        assert response.status_code == 200
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert len(context.captured_queries) == 0
+    
+    def test_not_modified_since(self, api_client, user_factory,
+                                album_factory):
+        user = user_factory()
+        album_factory(owner=user)
+        api_client.force_authenticate(user=user)
+        url = reverse('albums-list')
+        response = api_client.get(url)
+        response = api_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+    
+    def test_cached_response_only_looks_up_object(
+            self, api_client, user_factory, album_factory):
+        user = user_factory()
+        album = album_factory(owner=user)
+        api_client.force_authenticate(user=user)
+        url = reverse('albums-detail', kwargs={'pk': album.pk})
+        response = api_client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            cached_response = api_client.get(url)
+        # The object is looked up so that a missing one is never cached
+        assert len(context.captured_queries) == 1
+        assert cached_response.json() == response.json()
+    
+    @pytest.mark.parametrize('headers', [
+        {'HTTP_IF_NONE_MATCH': '*'},
+        {'HTTP_IF_MODIFIED_SINCE': 'Fri, 01 Jan 2100 00:00:00 GMT'},
+    ])
+    def test_conditional_request_for_missing_object(
+            self, api_client, user_factory, album_factory, headers):
+        user, other = user_factory(_quantity=2)
+        album = album_factory(owner=other)
+        api_client.force_authenticate(user=user)
+        for url in [reverse('photos-detail', kwargs={'pk': 999999}),
+                    reverse('albums-detail', kwargs={'pk': album.pk})]:
+            assert api_client.get(url, **headers).status_code == 404
+    
+    def test_conditional_request_with_invalid_filter(
+            self, api_client, user_factory):
+        api_client.force_authenticate(user=user_factory())
+        url = reverse('photos-list') + '?captured_after=garbage'
+        response = api_client.get(
+            url, HTTP_IF_NONE_MATCH='*',
+            HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        assert response.status_code == 400
+        response = api_client.get(
+            reverse('photos-list'), HTTP_IF_NONE_MATCH='*')
+        assert response.status_code == 200
+    
+    def test_invalidated_on_photo_change(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        url = reverse('photos-list')
+        etag = api_client.get(url)['ETag']
+        photo.tags.add('new tag')
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert response.json()['results'][0]['tags'] == ['new tag']
+        photo.delete()
+        response = api_client.get(url)
+        assert response.json()['results'] == []
+    
+    def test_cache_is_per_user(self, api_client, user_factory,
+                               album_factory):
+        user = user_factory(_quantity=2)
+        album_factory(owner=user[0])
+        url = reverse('albums-list')
+        api_client.force_authenticate(user=user[0])
+        etag = api_client.get(url)['ETag']
+        api_client.force_authenticate(user=user[1])
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()['results'] == []
+    
+    def test_version_expires(self, monkeypatch, user_factory):
+        user = user_factory()
+        monkeypatch.setattr(settings, 'API_CACHE_VERSION_TTL', 0)
+        caching.bump_version(user.pk)
+        assert caching.get_cache().get(f'api:version:{user.pk}') is None
+    
+    @pytest.mark.parametrize('debug, warned', [(False, True), (True, False)])
+    def test_local_memory_cache_warning(self, monkeypatch, debug, warned):
+        monkeypatch.setattr(settings, 'DEBUG', debug)
+        monkeypatch.setattr(settings, 'CACHES', {
+            'default': {'BACKEND': checks.LOCMEM_BACKEND}})
+        warnings = checks.check_shared_caches(None)
+        assert [warning.id for warning in warnings] == \
+            ['app.W001'] * 3 * warned
+
+
+@pytest.mark.django_db
+class TestSearch:
+    
+    def search(self, api_client, basename, q, **params):
+        url = reverse(f'{basename}-list') + '?' + urlencode({'q': q, **params})
+        response = api_client.get(url)
+        assert response.status_code == 200
+        return [item['id'] for item in response.json()['results']]
+    
+    def test_search_photos_by_title_album_and_tags(
+            self, api_client, user_factory, album_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        beach = album_factory(owner=user, title='Beach holidays')
+        city = album_factory(owner=user, title='City')
+        sunset = photo_factory(
+            owner=user, album=city, title='Red sunset', photo=photo_file())
+        sea = photo_factory(
+            owner=user, album=beach, title='Sea', photo=photo_file())
+        dog = photo_factory(
+            owner=user, album=city, title='Dog', photo=photo_file())
+        dog.tags.add('sunset')
+        photo_factory(owner=user, album=city, title='Street',
+                      photo=photo_file())
+        api_client.force_authenticate(user=user)
+        assert self.search(api_client, 'photos', 'sunset') == \
+            [sunset.id, dog.id]
+        assert self.search(api_client, 'photos', 'beach') == [sea.id]
+        assert self.search(api_client, 'photos', 'red sunset') == [sunset.id]
+        assert self.search(api_client, 'photos', 'mountains') == []
+    
+    def test_search_photos_is_owner_only(self, api_client, user_factory,
+                                         photo_factory, photo_file):
+        photo_factory(title='Sunset', photo=photo_file())
+        api_client.force_authenticate(user=user_factory())
+        assert self.search(api_client, 'photos', 'sunset') == []
+    
+    def test_search_is_invalidated_by_document_update(
+            self, api_client, monkeypatch, user_factory, photo_factory,
+            photo_file):
+        user = user_factory()
+        photo = photo_factory(owner=user, title='Old', photo=photo_file())
+        api_client.force_authenticate(user=user)
+        monkeypatch.setattr(settings, 'BACKGROUND_TASKS_EAGER', False)
+        api_client.patch(
+            reverse('photos-detail', args=[photo.id]), {'title': 'Wedding'})
+        assert self.search(api_client, 'photos', 'wedding') == []
+        search.update_photo_documents([photo.id])
+        assert self.search(api_client, 'photos', 'wedding') == [photo.id]
+    
+    def test_search_follows_album_rename(self, api_client, user_factory,
+                                         album_factory, photo_factory,
+                                         photo_file):
+        user = user_factory()
+        album = album_factory(owner=user, title='Untitled')
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        response = api_client.patch(
+            reverse('albums-detail', args=[album.id]), {'title': 'Wedding'})
+        assert response.status_code == 200
+        assert self.search(api_client, 'photos', 'wedding') == [photo.id]
+    
+    def test_search_after_bulk_update(self, api_client, user_factory,
+                                      album_factory, photo_factory,
+                                      photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        response = api_client.patch(
+            reverse('photos-bulk-create'),
+            [{'id': photo.id, 'title': 'Birthday', 'tags': ['party']}],
+            format='json')
+        assert response.status_code == 200
+        assert self.search(api_client, 'photos', 'party') == [photo.id]
+        assert self.search(api_client, 'photos', 'birthday') == [photo.id]
+    
+    def test_search_with_explicit_ordering(self, api_client, user_factory,
+                                           album_factory, photo_factory,
+                                           photo_file):
+        user = user_factory()
+        album = album_factory(owner=user, title='Trip')
+        photos = photo_factory(
+            _quantity=3, owner=user, album=album, photo=photo_file())
+        api_client.force_authenticate(user=user)
+        assert self.search(
+            api_client, 'photos', 'trip', ordering='uploaded_at',
+            page_size=1) == [photos[0].id]
+    
+    def test_search_albums(self, api_client, user_factory, album_factory):
+        user = user_factory()
+        summer = album_factory(owner=user, title='Summer 2022')
+        album_factory(owner=user, title='Winter 2022')
+        api_client.force_authenticate(user=user)
+        assert self.search(api_client, 'albums', 'summer') == [summer.id]
+
+
+@pytest.mark.django_db
+class TestSimilarity:
+    
+    @pytest.fixture
+    def photos(self, user_factory, album_factory, photo_factory):
+        user = user_factory()
+        album = album_factory(owner=user)
+        return [
+            photo_factory(owner=user, album=album, photo=photo)
+            for photo in [
+                make_pattern_photo(1),
+                make_pattern_photo(1, edited=1),
+                make_pattern_photo(1),
+                make_pattern_photo(2),
+            ]
+        ]
+    
+    def test_perceptual_hash_on_ingest(self, photos):
+        original, edited, copy, other = Photo.objects.order_by('pk')
+        assert original.perceptual_hash is not None
+        assert copy.perceptual_hash == original.perceptual_hash
+        assert copy.hash_band_0 == original.hash_band_0
+        assert phash.distance(
+            original.perceptual_hash, edited.perceptual_hash) in (1, 2)
+        assert phash.distance(
+            original.perceptual_hash, other.perceptual_hash) > 12
+    
+    def test_similar_photos(self, api_client, photos):
+        original, edited, copy, other = photos
+        api_client.force_authenticate(user=original.owner)
+        response = api_client.get(
+            reverse('photos-similar', kwargs={'pk': original.pk}))
+        assert response.status_code == 200
+        assert [photo['id'] for photo in response.json()] == \
+            [copy.id, edited.id]
+        assert response.json()[0]['distance'] == 0
+        response = api_client.get(
+            reverse('photos-similar', kwargs={'pk': original.pk}),
+            {'distance': 0})
+        assert [photo['id'] for photo in response.json()] == [copy.id]
+    
+    def test_similar_photos_invalid_distance(self, api_client, photos):
+        api_client.force_authenticate(user=photos[0].owner)
+        response = api_client.get(
+            reverse('photos-similar', kwargs={'pk': photos[0].pk}),
+            {'distance': 64})
+        assert response.status_code == 400
+    
+    def test_similar_photos_are_owner_only(self, api_client, user_factory,
+                                           album_factory, photo_factory,
+                                           photos):
+        user = user_factory()
+        photo = photo_factory(owner=user, album=album_factory(owner=user),
+                              photo=make_pattern_photo(1))
+        api_client.force_authenticate(user=user)
+        response = api_client.get(
+            reverse('photos-similar', kwargs={'pk': photo.pk}))
+        assert response.json() == []
+        response = api_client.get(
+            reverse('photos-similar', kwargs={'pk': photos[0].pk}))
+        assert response.status_code == 404
+    
+    def test_duplicates_report(self, api_client, photos):
+        original, edited, copy, other = photos
+        api_client.force_authenticate(user=original.owner)
+        response = api_client.get(reverse('photos-duplicates'))
+        assert response.status_code == 200
+        assert response.json() == [
+            {'photos': [original.id, edited.id, copy.id]}]
+        response = api_client.get(
+            reverse('photos-duplicates'), {'distance': 0})
+        assert response.json() == [{'photos': [original.id, copy.id]}]
+
+
+@pytest.mark.django_db
+class TestMedia:
+    
+    @pytest.fixture
+    def photo(self, user_factory, album_factory, photo_factory, photo_file):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        photo.refresh_from_db()
+        return photo
+    
+    def test_original(self, api_client, monkeypatch, photo):
+        monkeypatch.setattr(settings, 'MEDIA_SIGNED_URLS', False)
+        api_client.force_authenticate(user=photo.owner)
+        response = api_client.get(
+            reverse('photos-detail', kwargs={'pk': photo.pk}))
+        url = response.json()['photo']
+        assert url.startswith('http://testserver' + reverse(
+            'photos-original', kwargs={'pk': photo.pk}))
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'image/jpeg'
+        assert 'immutable' in response['Cache-Control']
+        assert response['Accept-Ranges'] == 'bytes'
+        with photo.photo.open('rb'):
+            assert b''.join(response.streaming_content) == photo.photo.read()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == 304
+    
+    def test_thumbnail(self, api_client, photo):
+        api_client.force_authenticate(user=photo.owner)
+        response = api_client.get(
+            reverse('photos-detail', kwargs={'pk': photo.pk}))
+        response = api_client.get(response.json()['thumbnail'])
+        assert response.status_code == 200
+        image = Image.open(BytesIO(b''.join(response.streaming_content)))
+        assert max(image.size) == 150
+    
+    @pytest.mark.parametrize(
+        'header, first, last',
+        [
+            ('bytes=0-9', 0, 9),
+            ('bytes=10-', 10, None),
+            ('bytes=-5', -5, None),
+        ]
+    )
+    def test_original_range(self, api_client, photo, header, first, last):
+        with photo.photo.open('rb'):
+            content = photo.photo.read()
+        expected = content[first:None if last is None else last + 1]
+        api_client.force_authenticate(user=photo.owner)
+        url = reverse('photos-original', kwargs={'pk': photo.pk})
+        response = api_client.get(url, HTTP_RANGE=header)
+        assert response.status_code == 206
+        assert b''.join(response.streaming_content) == expected
+        assert int(response['Content-Length']) == len(expected)
+        assert response['Content-Range'].endswith(f'/{len(content)}')
+    
+    def test_original_unsatisfiable_range(self, api_client, photo):
+        api_client.force_authenticate(user=photo.owner)
+        url = reverse('photos-original', kwargs={'pk': photo.pk})
+        response = api_client.get(url, HTTP_RANGE='bytes=100000000-')
+        assert response.status_code == 416
+        assert response['Content-Range'] == f'bytes */{photo.photo.size}'
+    
+    def test_original_not_owned_by_user(self, api_client, user_factory,
+                                        photo):
+        api_client.force_authenticate(user=user_factory())
+        url = reverse('photos-original', kwargs={'pk': photo.pk})
+        response = api_client.get(url)
+        assert response.status_code == 404
+    
+    def test_signed_url(self, api_client, photo):
+        api_client.force_authenticate(user=photo.owner)
+        response = api_client.get(
+            reverse('photos-detail', kwargs={'pk': photo.pk}))
+        url = response.json()['photo']
+        assert 'signature=' in url
+        api_client.force_authenticate(user=None)
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response['Cache-Control'].startswith('public')
+        with photo.photo.open('rb'):
+            assert b''.join(response.streaming_content) == photo.photo.read()
+    
+    def test_signed_url_is_stable_within_bucket(self, api_client, photo):
+        api_client.force_authenticate(user=photo.owner)
+        url = reverse('photos-detail', kwargs={'pk': photo.pk})
+        first = api_client.get(url)
+        second = api_client.get(url)
+        assert first.json()['photo'] == second.json()['photo']
+        assert first['ETag'] == second['ETag']
+    
+    def test_signed_url_rolls_over_with_bucket(self, api_client, monkeypatch,
+                                               photo):
+        api_client.force_authenticate(user=photo.owner)
+        url = reverse('photos-detail', kwargs={'pk': photo.pk})
+        response = api_client.get(url)
+        now = time.time() + settings.MEDIA_SIGNED_URL_BUCKET
+        monkeypatch.setattr(time, 'time', lambda: now)
+        rolled = api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert rolled.status_code == 200
+        assert rolled.json()['photo'] != response.json()['photo']
+    
+    @pytest.mark.parametrize('param', ['signature', 'expires'])
+    def test_tampered_signed_url(self, api_client, photo, param):
+        url = media.get_signed_url(photo.photo.name)
+        url = url.replace(f'{param}=', f'{param}=1')
+        response = api_client.get(url)
+        assert response.status_code == 403
+    
+    def test_expired_signed_url(self, api_client, monkeypatch, photo):
+        url = media.get_signed_url(photo.photo.name)
+        now = media.get_expires() + 1
+        monkeypatch.setattr(time, 'time', lambda: now)
+        response = api_client.get(url)
+        assert response.status_code == 403
+    
+    @pytest.mark.parametrize(
+        'backend, header',
+        [
+            ('x-accel-redirect', 'X-Accel-Redirect'),
+            ('x-sendfile', 'X-Sendfile'),
+        ]
+    )
+    def test_original_offloaded_to_web_server(
+            self, api_client, monkeypatch, photo, backend, header):
+        monkeypatch.setattr(settings, 'MEDIA_SERVE_BACKEND', backend)
+        api_client.force_authenticate(user=photo.owner)
+        url = reverse('photos-original', kwargs={'pk': photo.pk})
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response[header].endswith(photo.photo.name)
+        assert response.content == b''
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    
+    @staticmethod
+    def seed(user, album, photo_factory, photo_file, amount):
+        photos = photo_factory(
+            _quantity=amount, owner=user, album=album, photo=photo_file())
+        for photo in photos:
+            photo.tags.add('tag1', f'tag{photo.pk}')
+        return photos
+    
+    def count_queries(self, api_client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(url)
+        assert response.status_code == 200
+        return len(context.captured_queries)
+    
+    @pytest.mark.parametrize('endpoint', list(QUERY_BUDGETS))
+    def test_query_budget(self, api_client, user_factory, album_factory,
+                          photo_factory, photo_file, endpoint):
+        user = user_factory()
+        album = album_factory(owner=user)
+        photo = self.seed(user, album, photo_factory, photo_file, 1)[0]
+        api_client.force_authenticate(user=user)
+        kwargs = {}
+        if endpoint == 'albums-detail':
+            kwargs = {'pk': album.pk}
+        elif endpoint == 'photos-detail':
+            kwargs = {'pk': photo.pk}
+        url = reverse(endpoint, kwargs=kwargs)
+        queries_before = self.count_queries(api_client, url)
+        album_factory(_quantity=5, owner=user)
+        self.seed(user, album, photo_factory, photo_file, 5)
+        queries_after = self.count_queries(api_client, url)
+        assert queries_after == queries_before
+        assert queries_after <= QUERY_BUDGETS[endpoint]
@@ -0,0 +1,211 @@
+import zipfile
+from io import BytesIO, StringIO
+
+import pytest
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from app import exif, importer
+from app.models import Album, Photo
+from app.renditions import get_rendition_path, get_source_rendition_path
+
+
+@pytest.mark.django_db
+class TestCommands:
+    
+    def test_explain_queries(self):
+        out = StringIO()
+        call_command(
+            'explain_queries', users=2, albums=2, photos=3, offset=2,
+            stdout=out)
+        assert 'photos: list (cursor at 2)' in out.getvalue()
+        assert 'albums: ordering=-photos_count' in out.getvalue()
+        assert not Photo.objects.exists()
+    
+    def test_explain_queries_with_allowed_hosts(self, settings, monkeypatch):
+        settings.ALLOWED_HOSTS = ['.example.com']
+        monkeypatch.setattr('config.settings.ALLOWED_HOSTS', ['.example.com'])
+        out = StringIO()
+        call_command(
+            'explain_queries', users=1, albums=1, photos=2, stdout=out)
+        assert 'albums: list' in out.getvalue()
+
+    def test_sweep_orphan_files(self, settings, tmp_path, user_factory,
+                                album_factory, photo_factory, photo_file):
+        settings.MEDIA_ROOT = str(tmp_path)
+        user = user_factory()
+        album = album_factory(owner=user)
+        photo = photo_factory(owner=user, album=album, photo=photo_file())
+        photo.refresh_from_db()
+        rendition = default_storage.save(
+            get_rendition_path(photo, 'small'), ContentFile(b'rendition'))
+        orphans = [
+            default_storage.save(f'blobs/ab/cd/{"ab" * 32}.jpg',
+                                 ContentFile(b'blob')),
+            default_storage.save(
+                get_source_rendition_path('ef' * 32, 'small'),
+                ContentFile(b'rendition')),
+            default_storage.save('user_1/album_1/legacy.jpg',
+                                 ContentFile(b'legacy')),
+        ]
+        out = StringIO()
+        call_command('sweep_orphan_files', dry_run=True, min_age=0,
+                     batch_size=2, stdout=out)
+        assert '3 orphaned files found' in out.getvalue()
+        assert all(default_storage.exists(name) for name in orphans)
+        call_command('sweep_orphan_files', min_age=0, stdout=StringIO())
+        assert not any(default_storage.exists(name) for name in orphans)
+        for name in [photo.photo.name, photo.thumbnail.name, rendition]:
+            assert default_storage.exists(name)
+    
+    def test_sweep_keeps_recent_files(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        name = default_storage.save(f'blobs/ab/cd/{"ab" * 32}.jpg',
+                                    ContentFile(b'blob'))
+        call_command('sweep_orphan_files', stdout=StringIO())
+        assert default_storage.exists(name)
+
+    def test_extract_photo_metadata(self, photo_factory, photo_file):
+        photo = photo_factory(photo=photo_file())
+        Photo.objects.filter(pk=photo.pk).update(width=None, height=None)
+        out = StringIO()
+        call_command('extract_photo_metadata', stdout=out)
+        assert 'Photos processed: 1' in out.getvalue()
+        photo.refresh_from_db()
+        assert (photo.width, photo.height) == (1920, 1080)
+
+    def test_compute_perceptual_hashes(self, photo_factory, photo_file):
+        photo = photo_factory(photo=photo_file())
+        perceptual_hash = Photo.objects.get(pk=photo.pk).perceptual_hash
+        Photo.objects.filter(pk=photo.pk).update(
+            perceptual_hash=None, hash_band_0=None, hash_band_1=None,
+            hash_band_2=None, hash_band_3=None)
+        out = StringIO()
+        call_command('compute_perceptual_hashes', stdout=out)
+        assert 'Photos processed: 1' in out.getvalue()
+        photo.refresh_from_db()
+        assert photo.perceptual_hash == perceptual_hash
+        assert photo.hash_band_3 is not None
+    
+    def test_reconcile_album_counts(self, user_factory, album_factory,
+                                    photo_factory, photo_file):
+        user = user_factory()
+        album, empty = album_factory(_quantity=2, owner=user)
+        photo_factory(_quantity=2, owner=user, album=album,
+                      photo=photo_file())
+        Album.objects.filter(pk=album.pk).update(photos_count=5)
+        Album.objects.filter(pk=empty.pk).update(photos_count=1)
+        out = StringIO()
+        call_command('reconcile_album_counts', dry_run=True, stdout=out)
+        assert '2 albums checked, 2 counters found' in out.getvalue()
+        assert Album.objects.get(pk=album.pk).photos_count == 5
+        out = StringIO()
+        call_command('reconcile_album_counts', batch_size=1, stdout=out)
+        assert '2 albums checked, 2 counters fixed' in out.getvalue()
+        counts = dict(Album.objects.values_list('pk', 'photos_count'))
+        assert (counts[album.pk], counts[empty.pk]) == (2, 0)
+
+    @staticmethod
+    def make_import_source(root):
+        files = {}
+        for path, color, format in [
+            ('cover.jpg', 'red', 'jpeg'),
+            ('Trip/sea.jpg', 'blue', 'jpeg'),
+            ('Trip/Day 2/dog.png', 'green', 'png'),
+        ]:
+            content = BytesIO()
+            Image.new('RGB', (300, 200), color).save(content, format)
+            files[path] = content.getvalue()
+        files['Trip/broken.jpg'] = b'not an image'
+        files['Trip/notes.txt'] = b'skipped'
+        for path, content in files.items():
+            (root / path).parent.mkdir(parents=True, exist_ok=True)
+            (root / path).write_bytes(content)
+        return files
+    
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_import_photos(self, settings, tmp_path, user_factory, workers):
+        settings.MEDIA_ROOT = str(tmp_path / 'media')
+        user = user_factory(username='importer')
+        source = tmp_path / 'Archive'
+        files = self.make_import_source(source)
+        out, err = StringIO(), StringIO()
+        call_command('import_photos', str(source), user='importer',
+                     workers=workers, batch_size=2, tags=['imported'],
+                     stdout=out, stderr=err)
+        assert 'Photos imported: 3, files failed: 1' in out.getvalue()
+        assert 'Trip/broken.jpg' in err.getvalue()
+        albums = {album.title: album for album in Album.objects.all()}
+        assert set(albums) == {'Archive', 'Trip'}
+        dog = Photo.objects.get(title='dog')
+        assert dog.owner == user and dog.album == albums['Trip']
+        assert set(dog.tags.names()) == {'Day 2', 'imported'}
+        assert dog.photo.read() == files['Trip/Day 2/dog.png']
+        assert dog.thumbnail_status == Photo.ThumbnailStatus.READY
+        assert Image.open(dog.thumbnail).size == (150, 100)
+        assert (dog.width, dog.height) == (300, 200)
+        assert dog.perceptual_hash is not None
+        assert 'day 2' in dog.search_document
+        assert Photo.objects.get(title='cover').album == albums['Archive']
+    
+    def test_import_photos_resumes_from_checkpoint(
+            self, settings, tmp_path, user_factory):
+        settings.MEDIA_ROOT = str(tmp_path / 'media')
+        user_factory(username='importer')
+        files = self.make_import_source(tmp_path / 'source')
+        source = tmp_path / 'photos.zip'
+        with zipfile.ZipFile(source, 'w') as archive:
+            for path, content in files.items():
+                archive.writestr(path, content)
+        checkpoint = tmp_path / 'progress'
+        checkpoint.write_text('Trip/sea.jpg\n')
+        out = StringIO()
+        call_command('import_photos', str(source), user='importer',
+                     workers=1, checkpoint=str(checkpoint), stdout=out,
+                     stderr=StringIO())
+        assert 'Photos imported: 2' in out.getvalue()
+        assert set(Photo.objects.values_list('title', flat=True)) == \
+            {'cover', 'dog'}
+        assert Album.objects.filter(title='photos').exists()
+        out = StringIO()
+        call_command('import_photos', str(source), user='importer',
+                     workers=1, checkpoint=str(checkpoint), stdout=out)
+        assert '0 files to import, 4 already imported' in out.getvalue()
+        assert Photo.objects.count() == 2
+    
+    def test_import_photos_retries_failed_reads(
+            self, settings, tmp_path, monkeypatch, user_factory):
+        settings.MEDIA_ROOT = str(tmp_path / 'media')
+        user_factory(username='importer')
+        source = tmp_path / 'source'
+        self.make_import_source(source)
+        read_file, read_metadata = importer.read_file, exif.read_metadata
+        
+        def failing_read_file(source, path):
+            if path == 'cover.jpg':
+                raise OSError('storage is not available')
+            return read_file(source, path)
+        
+        def failing_read_metadata(file):
+            if Image.open(file).format == 'PNG':
+                raise AttributeError('unexpected metadata')
+            return read_metadata(file)
+        
+        monkeypatch.setattr(importer, 'read_file', failing_read_file)
+        monkeypatch.setattr(exif, 'read_metadata', failing_read_metadata)
+        out, err = StringIO(), StringIO()
+        call_command('import_photos', str(source), user='importer',
+                     workers=1, stdout=out, stderr=err)
+        assert 'Photos imported: 1, files failed: 3' in out.getvalue()
+        assert 'cover.jpg: storage is not available (will be retried)' in \
+            err.getvalue()
+        assert 'AttributeError: unexpected metadata' in err.getvalue()
+        monkeypatch.setattr(importer, 'read_file', read_file)
+        out = StringIO()
+        call_command('import_photos', str(source), user='importer',
+                     workers=1, stdout=out, stderr=StringIO())
+        assert '1 files to import, 3 already imported' in out.getvalue()
+        assert set(Photo.objects.values_list('title', flat=True)) == \
+            {'cover', 'sea'}
@@ -3,15 +3,33 @@ import tempfile
 import pytest
 from PIL import Image
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files import File
 from model_bakery import baker
 from rest_framework.test import APIClient
 
 from app.models import Album, Photo
+from config import settings
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def eager_background_tasks(monkeypatch):
+    monkeypatch.setattr(settings, 'BACKGROUND_TASKS_EAGER', True)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # Stored files never reach the working tree or leak between tests
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -1,5 +1,10 @@
 from django.contrib.auth.models import User
 from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.throttling import ScopedRateThrottle
+
+from users.authentication import CachedTokenAuthentication
+from users.hashers import PBKDF2PasswordHasher
 
 
 class TestUsers:
@@ -45,3 +50,75 @@ class TestUsers:
         response = api_client.post(
             url, data={'username': user.username, 'password': password + 'a'})
         assert response.status_code == 401
+    
+    def test_token_authentication_is_cached(
+            self, db, api_client, user_factory, django_assert_num_queries):
+        user = user_factory()
+        token = Token.objects.create(user=user)
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(token.key)
+        with django_assert_num_queries(0):
+            cached_user, cached_token = \
+                authentication.authenticate_credentials(token.key)
+        assert cached_user == user
+        assert cached_token.key == token.key
+    
+    def test_user_logout(self, db, api_client, user_factory):
+        user = user_factory()
+        token = Token.objects.create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = api_client.get(reverse('albums-list'))
+        assert response.status_code == 200
+        response = api_client.post(reverse('user-logout'))
+        assert response.status_code == 204
+        response = api_client.get(reverse('albums-list'))
+        assert response.status_code == 401
+    
+    def test_deactivated_user_token_is_rejected(
+            self, db, api_client, user_factory):
+        user = user_factory()
+        token = Token.objects.create(user=user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        assert api_client.get(reverse('albums-list')).status_code == 200
+        user.is_active = False
+        user.save()
+        assert api_client.get(reverse('albums-list')).status_code == 401
+    
+    def test_user_login_single_user_query(
+            self, db, api_client, user_factory, django_assert_num_queries):
+        user = user_factory()
+        password = User.objects.make_random_password()
+        user.set_password(password)
+        user.save()
+        Token.objects.create(user=user)
+        
+        url = reverse('user-login')
+        with django_assert_num_queries(1):
+            response = api_client.post(
+                url, data={'username': user.username, 'password': password})
+        assert response.json()['token'] == user.auth_token.key
+    
+    def test_user_login_upgrades_password_hash(
+            self, db, api_client, user_factory, monkeypatch):
+        user = user_factory()
+        password = User.objects.make_random_password()
+        user.set_password(password)
+        user.save()
+        monkeypatch.setattr(PBKDF2PasswordHasher, 'iterations', 1000)
+        
+        url = reverse('user-login')
+        response = api_client.post(
+            url, data={'username': user.username, 'password': password})
+        assert response.status_code == 200
+        user.refresh_from_db()
+        assert user.password.startswith('pbkdf2_sha256$1000$')
+        assert user.check_password(password)
+    
+    def test_user_login_throttled(self, db, api_client, monkeypatch):
+        monkeypatch.setitem(
+            ScopedRateThrottle.THROTTLE_RATES, 'login', '2/min')
+        url = reverse('user-login')
+        data = {'username': 'unknown', 'password': 'password'}
+        assert api_client.post(url, data=data).status_code == 404
+        assert api_client.post(url, data=data).status_code == 404
+        assert api_client.post(url, data=data).status_code == 429
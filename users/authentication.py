@@ -0,0 +1,24 @@
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from config import settings
+
+
+def get_token_cache_key(key):
+    return f'auth:token:{key}'
+
+
+def invalidate_token(key):
+    caches[settings.AUTH_TOKEN_CACHE_ALIAS].delete(get_token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache = caches[settings.AUTH_TOKEN_CACHE_ALIAS]
+        token = cache.get(get_token_cache_key(key))
+        if token is not None:
+            return token.user, token
+        user, token = super().authenticate_credentials(key)
+        cache.set(
+            get_token_cache_key(key), token, settings.AUTH_TOKEN_CACHE_TTL)
+        return user, token
@@ -37,3 +37,10 @@ REGISTRATION_SUCCESS = OpenApiExample(
     status_codes=[201],
     response_only=True,
 )
+
+TOO_MANY_ATTEMPTS = OpenApiExample(
+    name='Слишком много попыток входа',
+    value={'detail': 'Request was throttled. Expected available in 60 seconds.'},
+    status_codes=[429],
+    response_only=True,
+)
@@ -0,0 +1,7 @@
+from django.contrib.auth import hashers
+
+from config import settings
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = settings.PASSWORD_HASH_ITERATIONS
@@ -0,0 +1,31 @@
+import statistics
+import time
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Измерение времени хеширования пароля основным алгоритмом'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument(
+            '--target-ms', type=float, default=250,
+            help='Желаемое время проверки пароля, мс')
+
+    def handle(self, *args, **options):
+        hasher = get_hasher('default')
+        timings = []
+        for _ in range(options['rounds']):
+            start = time.perf_counter()
+            hasher.encode('measure-password', hasher.salt())
+            timings.append((time.perf_counter() - start) * 1000)
+        elapsed = statistics.median(timings)
+        self.stdout.write(f'{hasher.algorithm}: {elapsed:.1f} ms per hash')
+        iterations = getattr(hasher, 'iterations', None)
+        if isinstance(iterations, int):
+            suggested = int(iterations * options['target_ms'] / elapsed)
+            self.stdout.write(
+                f'PASSWORD_HASH_ITERATIONS={suggested} '
+                f'for ~{options["target_ms"]:.0f} ms')
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, raw=False, update_fields=None,
+                           **kwargs):
+    if raw or update_fields == frozenset(['last_login']):
+        return
+    for key in Token.objects.filter(user=instance)\
+            .values_list('key', flat=True):
+        invalidate_token(key)
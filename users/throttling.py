@@ -0,0 +1,10 @@
+from django.core.cache import caches
+from rest_framework.throttling import ScopedRateThrottle
+
+from config import settings
+
+
+class SharedScopedRateThrottle(ScopedRateThrottle):
+    # Request history has to be shared by the worker processes, otherwise
+    # each of them allows the whole rate
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
@@ -1,9 +1,10 @@
 from django.urls import path
 
-from users.views import UserLoginView, UserRegistrationView
+from users.views import UserLoginView, UserLogoutView, UserRegistrationView
 
 urlpatterns = [
     path('login/', UserLoginView.as_view(), name='user-login'),
+    path('logout/', UserLogoutView.as_view(), name='user-logout'),
     path('register/', UserRegistrationView.as_view(
         {'post': 'create'}), name='user-registration')
 ]
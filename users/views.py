@@ -1,6 +1,6 @@
 from django.contrib.auth.models import User
 from drf_spectacular.utils import extend_schema
-from rest_framework import viewsets, generics, mixins
+from rest_framework import viewsets, generics, mixins, permissions, status
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import NotFound, NotAuthenticated
 from rest_framework.response import Response
@@ -11,6 +11,7 @@ from users.serializers import (
     UserLoginSerializer,
     ErrorDetailSerializer
 )
+from users.throttling import SharedScopedRateThrottle
 
 
 class UserRegistrationView(viewsets.GenericViewSet, mixins.CreateModelMixin):
@@ -40,18 +41,22 @@ class UserRegistrationView(viewsets.GenericViewSet, mixins.CreateModelMixin):
 
 class UserLoginView(generics.CreateAPIView):
     serializer_class = UserLoginSerializer
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scope = 'login'
     
     @extend_schema(
         summary='Аутентификация (получение токена)',
         responses={
             200: UserLoginSerializer,
             400: ErrorDetailSerializer,
-            401: ErrorDetailSerializer
+            401: ErrorDetailSerializer,
+            429: ErrorDetailSerializer
         },
         examples=[
             examples.LOGIN_SUCCESS,
             examples.USER_NOT_FOUND,
-            examples.WRONG_PASSWORD
+            examples.WRONG_PASSWORD,
+            examples.TOO_MANY_ATTEMPTS
         ]
     )
     def post(self, request, *args, **kwargs):
@@ -60,10 +65,28 @@ class UserLoginView(generics.CreateAPIView):
         username = serializer.validated_data['username']
         password = serializer.validated_data['password']
         
-        user = User.objects.filter(username=username)
-        if not user:
+        user = User.objects.select_related('auth_token')\
+            .filter(username=username).first()
+        if user is None:
             raise NotFound({'detail': 'user not found'})
-        if not user or not user.first().check_password(password):
+        if not user.check_password(password):
             raise NotAuthenticated({'detail': 'wrong credentials'})
-        token, _ = Token.objects.get_or_create(user=user.first())
+        try:
+            token = user.auth_token
+        except Token.DoesNotExist:
+            token, _ = Token.objects.get_or_create(user=user)
         return Response({'token': token.key})
+
+
+class UserLogoutView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = None
+    
+    @extend_schema(
+        summary='Выход (удаление токена)',
+        request=None,
+        responses={204: None, 401: ErrorDetailSerializer}
+    )
+    def post(self, request, *args, **kwargs):
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)